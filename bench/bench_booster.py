@@ -0,0 +1,50 @@
+import argparse                           # command line options
+import os                                 # paths
+import sys                                # so we can import the bot's modules from the parent directory
+import time                               # timing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy
+from booster import BoosterGenerator
+from carddb import CardDB
+
+# a made up set with a modern pack layout, for when there's no card store to benchmark against
+def syntheticDB():
+	cards = []
+	for rarity, many in (('Common', 101), ('Uncommon', 80), ('Rare', 53), ('Mythic Rare', 15), ('Basic Land', 15)):
+		cards.extend({'name': '%s %s' % (rarity, i), 'rarity': rarity, 'layout': 'normal'} for i in range(many))
+	db = CardDB()
+	db.sets['BEN'] = {'code': 'BEN', 'name': 'Bench', 'releaseDate': '2017-01-01', 'booster': [['rare', 'mythic rare']] + ['uncommon'] * 3 + ['common'] * 10 + ['land', 'marketing'], 'cards': cards}
+	return db
+
+def main():
+	parser = argparse.ArgumentParser(description='Packs per second from the local booster generator.')
+	parser.add_argument('--store', help='card store to use instead of the synthetic set (cards.json)')
+	parser.add_argument('--set', default='BEN', help='set code to open')
+	parser.add_argument('--seconds', type=float, default=2.0, help='how long to run each batch size')
+	args = parser.parse_args()
+	db = CardDB()
+	if not (args.store and db.load(args.store)):
+		db = syntheticDB()
+		args.set = 'BEN'
+	start = time.perf_counter()
+	generator = BoosterGenerator(db, seed=1)
+	print('sheets for %s sets built in %.1f ms' % (len(generator.sheets), (time.perf_counter() - start) * 1000))
+	# same seed, same packs
+	assert BoosterGenerator(db, seed=7).open(args.set, 3) == BoosterGenerator(db, seed=7).open(args.set, 3)
+	print('%10s %14s %14s' % ('batch', 'packs/s', 'ms/batch'))
+	for batch in (1, 8, 24, 1000):
+		rng = numpy.random.RandomState(batch)
+		packs = 0
+		batches = 0
+		start = time.perf_counter()
+		while time.perf_counter() - start < args.seconds:
+			generator.open(args.set, batch, rng)
+			packs = packs + batch
+			batches = batches + 1
+		elapsed = time.perf_counter() - start
+		print('%10s %14.0f %14.3f' % (batch, packs / elapsed, elapsed / batches * 1000))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,82 @@
+import argparse                           # command line options
+import os                                 # paths
+import sys                                # so we can import the bot's modules from the parent directory
+import time                               # timing
+import tracemalloc                        # peak memory per parse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bs4 import BeautifulSoup             # the old way, for comparison
+from priceparse import extractPrices, extractSearch, CHUNK_SIZE
+from standin import loadPages             # saved pages from bench/fixtures, or stand-ins shaped like them
+
+# the full-parse versions the bot used before priceparse.py, kept here only to compare against
+def soupPrices(html):
+	soup = BeautifulSoup(html, 'html.parser')
+	onlinepricelist = soup.findAll('div', class_="price-box online")
+	paperpricelist = soup.findAll('div', class_="price-box paper")
+	onlineprice = 'None'
+	paperprice = 'None'
+	if (len(onlinepricelist) > 0):
+		onlineprice = onlinepricelist[0].find('div', class_="price-box-price").contents[0]
+	if (len(paperpricelist) > 0):
+		paperprice = paperpricelist[0].find('div', class_="price-box-price").contents[0]
+	return (onlineprice, paperprice)
+
+def soupSearch(html):
+	soup = BeautifulSoup(html, 'html.parser')
+	return [title.find('a').contents[0] for title in soup.findAll('span', class_="cardTitle")]
+
+# the extractors against soup on the page as it is and shifted along by up to shift characters, so the extractors' chunk boundaries land everywhere in the values they pull out. Returns how many of them disagreed
+def check(name, contenders, html, shift):
+	expected = contenders[0][1](html)
+	extract = contenders[1][1]
+	disagreements = 0
+	for offset in range(shift + 1):
+		found = extract(' ' * offset + html)
+		if found != expected:
+			disagreements = disagreements + 1
+			print('%s shifted by %s: extractor disagrees with soup: %r != %r' % (name, offset, found, expected))
+	return disagreements
+
+# best of a few runs, so a stray GC pause doesn't skew things, plus peak memory from one traced run
+def measure(func, html, runs):
+	times = []
+	for run in range(runs):
+		start = time.perf_counter()
+		func(html)
+		times.append(time.perf_counter() - start)
+	tracemalloc.start()
+	func(html)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return min(times), peak
+
+def main():
+	parser = argparse.ArgumentParser(description='Compare full BeautifulSoup parses with the targeted extractors on saved pages (bench/fixtures/*.html, names containing "gatherer" are treated as search pages).')
+	parser.add_argument('--runs', type=int, default=20)
+	parser.add_argument('--shift', type=int, default=300, help='check the extractors with the page shifted by every offset up to this many characters (default 300)')
+	args = parser.parse_args()
+	pages = loadPages()
+	if all(name.startswith('synthetic') for name, kind, html in pages):
+		print('No saved pages in bench/fixtures, so this only checks the synthetic stand-ins. Run bench/record_fixtures.py to save real ones')
+	disagreements = 0
+	for name, kind, html in pages:
+		disagreements = disagreements + check(name, contenders(kind), html, min(args.shift, CHUNK_SIZE))
+	if disagreements:
+		print('%s extractions disagreed with soup' % disagreements)
+		return 1
+	print('%-28s %8s %-10s %10s %10s' % ('page', 'KiB', 'parser', 'ms', 'peak KiB'))
+	for name, kind, html in pages:
+		for label, contender in contenders(kind):
+			seconds, peak = measure(contender, html, args.runs)
+			print('%-28s %8.0f %-10s %10.2f %10.0f' % (name, len(html) / 1024, label, seconds * 1000, peak / 1024))
+	return 0
+
+def contenders(kind):
+	if kind == 'goldfish':
+		return [('soup', soupPrices), ('extractor', extractPrices)]
+	return [('soup', soupSearch), ('extractor', lambda page: extractSearch(page)[0])]
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,116 @@
+import argparse                           # command line options
+import asyncio                            # each worker replays its messages on its own loop
+import concurrent.futures                 # threads for the workers' calls to the shared store
+import multiprocessing                    # the workers, and the queues the fake gateway feeds them through
+import os                                 # paths, random auth key
+import random                             # message mix and server ids
+import sys                                # so we can import the bot from the parent directory
+import time                               # throughput and latency
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import harness                            # fake Discord messages and client, the message mix
+from standin import StandIn               # local MTG Goldfish, Gatherer and mtgsdk API
+from carddb import CardDB
+from shared import SharedManager, SharedCache, SharedFlights, shardFor
+from launcher import shareLimits          # each worker's share of the rate limits, like the real thing
+
+# one worker process, set up the way launcher.py sets one up but with a fake client. It tells the gateway when it's ready, replays what the gateway sends it and reports back when the gateway sends None
+def benchWorker(worker, workers, base, store, configPath, address, authkey, inbox, outbox, concurrency):
+	import mtg
+	manager = SharedManager(address=address, authkey=authkey)
+	manager.connect()
+	executor = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+	mtg.flights = SharedFlights(manager.store(), executor)
+	mtg.diskCache = SharedCache(manager.store(), mtg.diskCache, executor)
+	harness.prepareBot(base, store, configPath)
+	shareLimits(mtg, workers)
+	loop = asyncio.get_event_loop()
+	latencies = []
+	errors = [0]
+	limit = asyncio.Semaphore(concurrency)
+	@asyncio.coroutine
+	def one(content, serverId, channelId, userId):
+		try:
+			start = time.perf_counter()
+			try:
+				yield from mtg.on_message(harness.fakeMessage(content, channelId, userId, serverId))
+			except Exception:
+				errors[0] += 1
+			latencies.append(time.perf_counter() - start)
+		finally:
+			limit.release()
+	@asyncio.coroutine
+	def gateway():
+		tasks = []
+		while True:
+			message = yield from loop.run_in_executor(None, inbox.get)
+			if message is None:
+				break
+			yield from limit.acquire()
+			tasks.append(asyncio.ensure_future(one(*message)))
+		yield from asyncio.gather(*tasks)
+	outbox.put(('ready', worker))
+	loop.run_until_complete(gateway())
+	outbox.put(('done', worker, latencies, errors[0], mtg.client.sent, mtg.flights.stats()))
+	loop.run_until_complete(mtg.fetcher.close())
+
+# run every message through workers processes, each owning one shard, and return (seconds, latencies, errors, replies sent, cross worker lookups joined)
+def runShards(workers, messages, base, store, configPath, concurrency):
+	authkey = os.urandom(16)
+	manager = SharedManager(address=('127.0.0.1', 0), authkey=authkey)
+	manager.start()
+	inboxes = [multiprocessing.Queue() for worker in range(workers)]
+	outbox = multiprocessing.Queue()
+	processes = [multiprocessing.Process(target=benchWorker, args=(worker, workers, base, store, configPath, manager.address, authkey, inboxes[worker], outbox, concurrency)) for worker in range(workers)]
+	try:
+		for process in processes:
+			process.start()
+		for worker in range(workers):
+			outbox.get() # wait until they've all loaded the card store and so on
+		start = time.perf_counter()
+		for content, serverId, channelId, userId in messages: # the fake gateway: each message goes to the worker that owns its server's shard
+			inboxes[shardFor(serverId, workers)].put((content, serverId, channelId, userId))
+		for inbox in inboxes:
+			inbox.put(None)
+		reports = [outbox.get() for worker in range(workers)]
+		elapsed = time.perf_counter() - start
+	finally:
+		for process in processes:
+			process.join(30)
+		manager.shutdown()
+	latencies = [latency for report in reports for latency in report[2]]
+	joined = sum(sum(report[5]['joined'].values()) for report in reports)
+	return elapsed, latencies, sum(report[3] for report in reports), sum(report[4] for report in reports), joined
+
+def main():
+	parser = argparse.ArgumentParser(description='Throughput of the sharded bot (launcher.py) with 1, 2, 4... worker processes, fed by a fake Discord gateway and backed by local stand-ins for MTG Goldfish, Gatherer and the mtgsdk API.')
+	parser.add_argument('--workers', default='1,2,4', help='comma separated worker counts to try, one shard per worker')
+	parser.add_argument('--messages', type=int, default=2000, help='messages to replay for each worker count')
+	parser.add_argument('--servers', type=int, default=200, help='Discord servers the messages come from, spread over the shards')
+	parser.add_argument('--concurrency', type=int, default=20, help='messages in flight at once in each worker')
+	parser.add_argument('--latency', type=float, default=5, help='stand-in response time in ms')
+	parser.add_argument('--store', help='card store to load (cards.json). Lookups then mostly run on the CPU, which is what sharding spreads out')
+	parser.add_argument('--config', help='ini file with settings to run the workers with')
+	parser.add_argument('--seed', type=int, default=1)
+	args = parser.parse_args()
+	random.seed(args.seed)
+	standin = StandIn(args.latency / 1000, 0)
+	base = standin.start()
+	db = CardDB()
+	names = db.cardNames() if args.store and db.load(args.store) else standin.names
+	servers = [random.getrandbits(40) << 22 for server in range(args.servers)] # snowflake ids, the shard comes from the bits above the timestamp's lowest 22
+	messages = [(content, server, '%s-%s' % (server, random.randint(0, 4)), random.randint(0, 999)) for (label, content), server in zip(harness.pickMessages(harness.messageMix(names), args.messages), (random.choice(servers) for message in range(args.messages)))]
+	print('%-8s %10s %10s %9s %9s %8s %8s %8s' % ('workers', 'seconds', 'msgs/s', 'p50 ms', 'p95 ms', 'speedup', 'errors', 'joined'))
+	baseline = None
+	try:
+		for workers in [int(count) for count in args.workers.split(',')]:
+			elapsed, latencies, errors, sent, joined = runShards(workers, messages, base, args.store, args.config, args.concurrency)
+			rate = len(messages) / elapsed
+			baseline = baseline or rate
+			print('%-8d %10.2f %10.1f %9.1f %9.1f %7.2fx %8d %8d' % (workers, elapsed, rate, harness.percentile(latencies, 0.5) * 1000, harness.percentile(latencies, 0.95) * 1000, rate / baseline, errors, joined))
+	finally:
+		standin.stop()
+
+if __name__ == '__main__':
+	main()
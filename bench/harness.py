@@ -0,0 +1,148 @@
+import argparse                           # command line options
+import asyncio                            # the bot's handlers are coroutines
+import collections                        # results per command
+import configparser                       # hand the bot a config without a config.ini
+import os                                 # paths
+import random                             # message mix
+import sys                                # so we can import the bot from the parent directory
+import time                               # latency
+import tracemalloc                        # memory per command
+from types import SimpleNamespace         # fake Discord objects
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from standin import StandIn               # local MTG Goldfish, Gatherer and mtgsdk API
+
+# stands in for discord.Client. Replies are counted instead of sent
+class FakeClient:
+
+	def __init__(self):
+		self.sent = 0
+		self.characters = 0
+
+	@asyncio.coroutine
+	def send_message(self, channel, content):
+		self.sent = self.sent + 1
+		self.characters = self.characters + len(content)
+
+	@asyncio.coroutine
+	def change_presence(self, game=None):
+		pass
+
+def fakeMessage(content, channel, user, server='bench'):
+	server = SimpleNamespace(id=str(server))
+	return SimpleNamespace(content=content, channel=SimpleNamespace(id=str(channel), server=server), server=server, author=SimpleNamespace(id=str(user)))
+
+# (label, weight, make message text) for a realistic mix of what people type. !N, !cont and !flip run against whatever that channel did last
+def messageMix(names):
+	def partial():
+		name = random.choice(names)
+		return '[[%s]]' % name.split()[-1][:3]
+	return [
+		('card', 40, lambda: '[[%s]]' % random.choice(names)),
+		('card+set', 5, lambda: '[[%s]]M10' % random.choice(names)),
+		('partial', 15, partial),
+		('decklist', 5, lambda: ' '.join('[[%s]]' % name for name in random.sample(names, min(10, len(names))))),
+		('search', 10, lambda: '!search %s' % random.choice(('rarity=common', 'types=creature;cmc=gte3', 'set=KLD;rarity=uncommon|rare'))),
+		('booster', 10, lambda: '!booster %s' % random.choice(('KLD', 'AER', 'M10'))),
+		('number', 10, lambda: '!%s' % random.randint(1, 25)),
+		('cont', 5, lambda: '!cont'),
+		('chatter', 30, lambda: 'anyone up for a draft tonight?'),
+	]
+
+def pickMessages(mix, count):
+	labels = [entry[0] for entry in mix]
+	weights = [entry[1] for entry in mix]
+	makers = {entry[0]: entry[2] for entry in mix}
+	return [(label, makers[label]()) for label in random.choices(labels, weights=weights, k=count)]
+
+def percentile(values, fraction):
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+# point the bot at the stand in and swap its Discord client for the fake one
+def prepareBot(base, store, configPath=None):
+	import mtg
+	import mtgsdk.querybuilder
+	import mtgsdk.set
+	mtg.client = FakeClient()
+	mtg.GOLDFISH_URL = base
+	mtg.GATHERER_URL = base
+	mtgsdk.querybuilder.__endpoint__ = base + '/v1' # mtgsdk copies its endpoint into each module at import time
+	mtgsdk.set.__endpoint__ = base + '/v1'
+	config = configparser.ConfigParser()
+	config.read_dict({'Scheduler': {'Rate': '1000', 'Burst': '1000', 'MaxQueue': '10000'}}) # every stand-in shares one host, so don't rate limit it like a real site unless --config says to
+	if configPath:
+		config.read(configPath) # the same sections as config.ini, to try out different limits and cache sizes
+	config.read_dict({'CardDB': {'Path': store or ''}}) # no path, no store
+	mtg.setup(config)
+	return mtg
+
+@asyncio.coroutine
+def replay(mtg, messages, concurrency, channels):
+	latencies = collections.defaultdict(list)
+	errors = collections.Counter()
+	limit = asyncio.Semaphore(concurrency)
+	@asyncio.coroutine
+	def one(number, label, content):
+		yield from limit.acquire()
+		try:
+			start = time.perf_counter()
+			try:
+				yield from mtg.on_message(fakeMessage(content, number % channels, number % (channels * 3)))
+			except Exception:
+				errors[label] += 1
+			latencies[label].append(time.perf_counter() - start)
+		finally:
+			limit.release()
+	start = time.perf_counter()
+	yield from asyncio.gather(*[one(number, label, content) for number, (label, content) in enumerate(messages)])
+	return latencies, errors, time.perf_counter() - start
+
+# peak memory allocated while handling a few of each kind of message, one at a time
+@asyncio.coroutine
+def memoryPerCommand(mtg, mix, samples):
+	peaks = {}
+	for label, weight, make in mix:
+		tracemalloc.start()
+		for sample in range(samples):
+			yield from mtg.on_message(fakeMessage(make(), 'memory', 'memory'))
+		peaks[label] = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+	return peaks
+
+def main():
+	parser = argparse.ArgumentParser(description='Replay a mix of Discord messages through the bot against local stand-ins for MTG Goldfish, Gatherer and the mtgsdk API.')
+	parser.add_argument('--messages', type=int, default=500, help='messages to replay')
+	parser.add_argument('--concurrency', type=int, default=20, help='messages in flight at once')
+	parser.add_argument('--channels', type=int, default=10, help='channels the messages are spread over')
+	parser.add_argument('--latency', type=float, default=50, help='stand-in response time in ms')
+	parser.add_argument('--jitter', type=float, default=20, help='random +/- ms added to each response')
+	parser.add_argument('--store', help='card store to load (cards.json), otherwise every lookup goes to the stand-in API')
+	parser.add_argument('--config', help='ini file with [Network], [Scheduler], [Cache], [Sessions] or [Booster] settings to run with')
+	parser.add_argument('--seed', type=int, default=1)
+	args = parser.parse_args()
+	random.seed(args.seed)
+	standin = StandIn(args.latency / 1000, args.jitter / 1000)
+	base = standin.start()
+	try:
+		mtg = prepareBot(base, args.store, args.config)
+		mix = messageMix(mtg.cardDB.cardNames() if mtg.cardDB else standin.names)
+		loop = asyncio.get_event_loop()
+		latencies, errors, elapsed = loop.run_until_complete(replay(mtg, pickMessages(mix, args.messages), args.concurrency, args.channels))
+		peaks = loop.run_until_complete(memoryPerCommand(mtg, mix, 3))
+		loop.run_until_complete(mtg.fetcher.close())
+		mtg.diskCache.close()
+	finally:
+		standin.stop()
+	print('%d messages in %.2fs, %.1f messages/s, %d replies sent' % (args.messages, elapsed, args.messages / elapsed, mtg.client.sent))
+	print('upstream requests: %s' % ', '.join('%s %s' % item for item in sorted(standin.requests.items())))
+	print('%-10s %6s %6s %9s %9s %9s %11s' % ('command', 'count', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'peak KiB'))
+	for label, weight, make in mix:
+		values = latencies.get(label, [])
+		print('%-10s %6d %6d %9.1f %9.1f %9.1f %11.0f' % (label, len(values), errors[label], percentile(values, 0.5) * 1000, percentile(values, 0.95) * 1000, percentile(values, 0.99) * 1000, peaks.get(label, 0) / 1024))
+
+if __name__ == '__main__':
+	main()
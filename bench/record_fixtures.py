@@ -0,0 +1,48 @@
+import argparse                           # command line options
+import os                                 # paths
+import sys                                # so we can import the bot's modules from the parent directory
+import time                               # be gentle with the sites
+import urllib.request                     # plain blocking fetches are fine for a one off recording
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from standin import FIXTURES              # where bench_parse.py and the stand-in look for saved pages
+
+# pages worth having: a card with both prices, a foil page, a card with no MTGO price, a Gatherer search spread over several pages and one that jumps straight to a card
+PAGES = (
+	('goldfish-doom-blade.html', 'https://www.mtggoldfish.com/price/Magic+2010/Doom+Blade'),
+	('goldfish-fatal-push-foil.html', 'https://www.mtggoldfish.com/price/Aether+Revolt:Foil/Fatal+Push'),
+	('goldfish-black-lotus.html', 'https://www.mtggoldfish.com/price/Limited+Edition+Alpha/Black+Lotus'),
+	('gatherer-search-blade.html', 'http://gatherer.wizards.com/Pages/Search/Default.aspx?name=+%5Bblade%5D'),
+	('gatherer-search-blade-page2.html', 'http://gatherer.wizards.com/Pages/Search/Default.aspx?name=+%5Bblade%5D&page=1'),
+	('gatherer-single-doom-blade.html', 'http://gatherer.wizards.com/Pages/Search/Default.aspx?name=+%5Bdoom%5D+%5Bblade%5D'),
+)
+
+# python3 bench/record_fixtures.py - saves the real pages above into bench/fixtures, so bench_parse.py checks the extractors against real markup and the stand-in serves it. Needs network access, run it again whenever the sites change their layout
+def main():
+	parser = argparse.ArgumentParser(description='Save real MTG Goldfish and Gatherer pages into bench/fixtures for bench_parse.py and the stand-in.')
+	parser.add_argument('--force', action='store_true', help='fetch pages again even if they are already saved')
+	args = parser.parse_args()
+	os.makedirs(FIXTURES, exist_ok=True)
+	failed = 0
+	for name, url in PAGES:
+		path = os.path.join(FIXTURES, name)
+		if os.path.exists(path) and not args.force:
+			print('%s already saved' % name)
+			continue
+		try:
+			request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0 (mtgbot fixture recorder)'})
+			with urllib.request.urlopen(request, timeout=30) as response:
+				html = response.read().decode(response.headers.get_content_charset() or 'utf-8', errors='replace')
+		except OSError as error:
+			failed = failed + 1
+			print('%s: %r' % (name, error))
+			continue
+		with open(path, 'w', encoding='utf-8') as f:
+			f.write(html)
+		print('%s %.0f KiB' % (name, len(html) / 1024))
+		time.sleep(1)
+	return 1 if failed else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,136 @@
+import glob                               # find saved pages
+import json                               # the card API speaks json
+import os                                 # paths
+import random                             # latency jitter and booster contents
+import threading                          # the server runs beside the bot's event loop
+import time                               # latency
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# stand-in pages with the same shape as the real ones (navigation up top, the bits we want, then a long tail of tables and scripts) for when there are no saved pages in bench/fixtures
+def syntheticGoldfish():
+	nav = ''.join('<li class="nav-item"><a href="/metagame/format%s">Format %s</a></li>\n' % (i, i) for i in range(200))
+	boxes = '<div class="price-box online"><div class="price-box-type">MTGO</div><div class="price-box-price">0.25</div></div>\n<div class="price-box paper"><div class="price-box-type">Paper</div><div class="price-box-price">$ 1.10</div></div>\n'
+	history = ''.join('<tr><td>2017-01-%02d</td><td class="text-right">%s.%02d</td><td><a href="/deck/%s">Deck</a></td></tr>\n' % (i % 28 + 1, i % 7, i % 100, i) for i in range(3000))
+	script = '<script>var d = "' + ','.join(str(i) for i in range(20000)) + '";</script>\n'
+	return '<html><head><title>Price</title></head><body><ul class="nav">%s</ul><div class="price-card">%s</div><table>%s</table>%s</body></html>' % (nav, boxes, history, script)
+
+def syntheticGatherer(names=None, total=None):
+	if names is None:
+		names = ['Blade Card %s' % i for i in range(100)]
+	nav = ''.join('<a href="/Pages/Default.aspx?x=%s">Link %s</a>\n' % (i, i) for i in range(300))
+	if total is not None: # the search heading with the result count, like the real thing
+		nav = '<span id="ctl00_ctl00_ctl00_MainContent_SubContent_SubContentHeader_searchTermDisplay">Search: +[blade] (%s)</span>\n' % total + nav
+	rows = ''.join('<tr class="cardItem"><td class="leftCol"><img src="/Handlers/Image.ashx?id=%s"/></td><td class="middleCol"><div class="cardInfo"><span class="cardTitle"><a href="../Card/Details.aspx?multiverseid=%s">%s</a></span><span class="manaCost">2B</span><span class="typeLine">Instant</span><div class="rulesText"><p>Destroy target nonblack creature.</p></div></div></td></tr>\n' % (i, i, name) for i, name in enumerate(names))
+	return '<html><body>%s<table class="cardItemTable">%s</table>%s</body></html>' % (nav, rows, nav)
+
+def syntheticGathererCard(name):
+	return '<html><body><span id="ctl00_ctl00_ctl00_MainContent_SubContent_SubContentHeader_subtitleDisplay">%s</span></body></html>' % name
+
+def loadPages():
+	pages = []
+	for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+		with open(path, encoding='utf-8', errors='replace') as f:
+			pages.append((os.path.basename(path), 'gatherer' if 'gatherer' in os.path.basename(path) else 'goldfish', f.read()))
+	if not pages:
+		pages = [('synthetic-goldfish', 'goldfish', syntheticGoldfish()), ('synthetic-gatherer', 'gatherer', syntheticGatherer())]
+	return pages
+
+# cards as the mtgsdk API returns them. bench/fixtures/mtgsdk-cards.json (a json list of API card objects) is used if it's there
+def loadCards():
+	path = os.path.join(FIXTURES, 'mtgsdk-cards.json')
+	if os.path.exists(path):
+		with open(path, encoding='utf-8') as f:
+			return json.load(f)
+	cards = []
+	sets = (('M10', 'Magic 2010'), ('KLD', 'Kaladesh'), ('AER', 'Aether Revolt'))
+	rarities = ('Common',) * 10 + ('Uncommon',) * 3 + ('Rare', 'Mythic Rare')
+	for i in range(400):
+		for code, setName in sets[:1 + i % 3]: # some cards are reprinted, like the real thing
+			multiverseid = len(cards) + 1
+			cards.append({'name': 'Card %s %s' % (('Blade', 'Angel', 'Bolt', 'Push', 'Growth')[i % 5], i), 'set': code, 'setName': setName, 'multiverseid': multiverseid, 'imageUrl': 'http://gatherer.wizards.com/Handlers/Image.ashx?multiverseid=%s&type=card' % multiverseid, 'rarity': rarities[i % len(rarities)], 'cmc': i % 7, 'types': ['Creature' if i % 2 else 'Instant']})
+	return cards
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+# a local stand in for MTG Goldfish, Gatherer and the mtgsdk API, with configurable latency so the bot can be measured without touching the real sites
+class StandIn:
+
+	def __init__(self, latency=0.05, jitter=0.02):
+		self.latency = latency
+		self.jitter = jitter
+		pages = loadPages()
+		self.goldfish = [html for name, kind, html in pages if kind == 'goldfish'] or [syntheticGoldfish()]
+		self.cards = loadCards()
+		self.byName = {}
+		for card in self.cards:
+			self.byName.setdefault(card['name'].lower(), []).append(card)
+		self.names = sorted(set(card['name'] for card in self.cards))
+		self.requests = {'goldfish': 0, 'gatherer': 0, 'cards': 0, 'booster': 0}
+		self.lock = threading.Lock()
+		self.server = None
+
+	def start(self):
+		standin = self
+		class Handler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				standin.handle(self)
+			def log_message(self, *args):
+				pass
+		self.server = ThreadingServer(('127.0.0.1', 0), Handler)
+		threading.Thread(target=self.server.serve_forever, daemon=True).start()
+		return 'http://127.0.0.1:%s' % self.server.server_address[1]
+
+	def stop(self):
+		if self.server is not None:
+			self.server.shutdown()
+			self.server.server_close()
+
+	def count(self, kind):
+		with self.lock:
+			self.requests[kind] = self.requests[kind] + 1
+
+	def handle(self, request):
+		time.sleep(max(0, self.latency + random.uniform(-self.jitter, self.jitter)))
+		url = urlsplit(request.path)
+		query = parse_qs(url.query)
+		if url.path.startswith('/price/'):
+			self.count('goldfish')
+			self.reply(request, random.choice(self.goldfish), 'text/html')
+		elif url.path.startswith('/Pages/Search'):
+			self.count('gatherer')
+			term = query.get('name', [''])[0].strip(' +[]').lower()
+			matches = [name for name in self.names if term in name.lower()]
+			page = int(query.get('page', ['0'])[0]) # Gatherer pages are 100 cards long and count from 0
+			self.reply(request, syntheticGathererCard(matches[0]) if len(matches) == 1 else syntheticGatherer(matches[page * 100:(page + 1) * 100], len(matches)), 'text/html')
+		elif url.path.endswith('/booster'):
+			self.count('booster')
+			code = url.path.split('/')[-2].upper()
+			pool = [card for card in self.cards if card['set'] == code]
+			self.reply(request, json.dumps({'cards': random.sample(pool, min(15, len(pool)))}), 'application/json')
+		elif url.path.endswith('/cards'):
+			self.count('cards')
+			if 'name' in query:
+				cards = self.byName.get(query['name'][0].strip('"').lower(), [])
+			else: # searches aren't filtered, the point is to measure paging through a big result
+				cards = self.cards
+			page = int(query.get('page', ['1'])[0])
+			pageSize = int(query.get('pageSize', ['100'])[0])
+			pageCards = cards[(page - 1) * pageSize:page * pageSize]
+			self.reply(request, json.dumps({'cards': pageCards}), 'application/json', {'Total-Count': str(len(cards))})
+		else:
+			request.send_error(404)
+
+	def reply(self, request, body, contentType, headers={}):
+		body = body.encode('utf-8')
+		request.send_response(200)
+		request.send_header('Content-Type', contentType)
+		request.send_header('Content-Length', str(len(body)))
+		for name, value in headers.items():
+			request.send_header(name, value)
+		request.end_headers()
+		request.wfile.write(body)
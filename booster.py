@@ -0,0 +1,113 @@
+try:
+	import numpy                          # draws every pack of a draft in one go
+except ImportError:
+	numpy = None                          # no numpy, the bot keeps asking the API for boosters
+
+FOIL_CHANCE = 1 / 91 # per card, the same odds as the old random.randint(0,90) == 1 roll
+MYTHIC_WEIGHT = 1 / 8 # a rare slot that can be mythic is mythic about one pack in eight
+
+# slot names from the set's booster definition that aren't cards we can hand out
+SKIPPED_SLOTS = ('marketing', 'checklist', 'token')
+
+# the cards a set's packs are made from, worked out once when the card store loads
+class SetSheets:
+
+	def __init__(self, cardset):
+		self.code = cardset['code']
+		booster = cardset.get('booster') or []
+		cards = [card for card in cardset.get('cards', []) if not card.get('starter') and frontFace(card)] # starter deck only cards never show up in packs, and neither do the backs of cards on their own
+		doubleFaced = any('double faced' in (slot if isinstance(slot, list) else [slot]) for slot in booster)
+		self.names = numpy.array([card['name'] for card in cards], dtype=object)
+		self.rarities = numpy.array([card.get('rarity', '') for card in cards], dtype=object)
+		self.pools = {} # slot name -> row numbers of the cards that can fill it
+		for slot in set(name for slot in booster for name in (slot if isinstance(slot, list) else [slot])):
+			if slot in SKIPPED_SLOTS:
+				continue
+			if slot == 'double faced':
+				rows = [row for row, card in enumerate(cards) if card.get('layout') == 'double-faced']
+			elif slot == 'land':
+				rows = [row for row, card in enumerate(cards) if card.get('rarity', '').lower() == 'basic land']
+			else:
+				rows = [row for row, card in enumerate(cards) if card.get('rarity', '').lower() == slot and not (doubleFaced and card.get('layout') == 'double-faced')]
+			if rows:
+				self.pools[slot] = numpy.array(rows, dtype=numpy.intp)
+		# single slots are drawn without repeats inside a pack, slots with a choice (rare or mythic) are drawn one at a time
+		self.fixed = {}  # slot name -> how many of it each pack gets
+		self.choices = [] # (slot names, weights) for each slot with a choice
+		self.layout = []  # ('fixed', name, nth of that name) or ('choice', index) in the order cards appear in the pack
+		for slot in booster:
+			if isinstance(slot, list):
+				names = [name for name in slot if name in self.pools]
+				if names:
+					weights = numpy.array([MYTHIC_WEIGHT if name == 'mythic rare' else 1.0 for name in names])
+					if 'mythic rare' in names and len(names) > 1:
+						weights[[i for i, name in enumerate(names) if name != 'mythic rare']] = (1 - MYTHIC_WEIGHT) / (len(names) - 1)
+					self.layout.append(('choice', len(self.choices)))
+					self.choices.append((names, weights / weights.sum()))
+			elif slot in self.pools:
+				self.layout.append(('fixed', slot, self.fixed.get(slot, 0)))
+				self.fixed[slot] = self.fixed.get(slot, 0) + 1
+		if not self.layout and len(self.names) > 0: # old sets without a booster definition get fifteen cards from the whole set
+			self.pools['any'] = numpy.arange(len(self.names))
+			self.fixed['any'] = 15
+			self.layout = [('fixed', 'any', i) for i in range(15)]
+
+	def __len__(self):
+		return len(self.layout)
+
+	# an (count, cards per pack) array of rows into names/rarities, one row per pack
+	def draw(self, rng, count):
+		drawn = {}
+		for slot, many in self.fixed.items():
+			pool = self.pools[slot]
+			if many <= len(pool): # every pack gets many different cards from the pool: rank random keys per pack and keep the lowest
+				picks = numpy.argpartition(rng.random_sample((count, len(pool))), many - 1, axis=1)[:, :many]
+			else:
+				picks = rng.randint(0, len(pool), size=(count, many))
+			drawn[slot] = pool[picks]
+		chosen = []
+		for names, weights in self.choices:
+			which = rng.choice(len(names), size=count, p=weights)
+			cards = numpy.empty(count, dtype=numpy.intp)
+			for i, name in enumerate(names):
+				packs = numpy.flatnonzero(which == i)
+				pool = self.pools[name]
+				cards[packs] = pool[rng.randint(0, len(pool), size=len(packs))]
+			chosen.append(cards)
+		columns = [drawn[entry[1]][:, entry[2]] if entry[0] == 'fixed' else chosen[entry[1]] for entry in self.layout]
+		return numpy.stack(columns, axis=1)
+
+# the store has an entry for each face or half of a double faced, flip, split or meld card, but only the card they're printed on goes in a pack. That's the first of its names, except that both halves of a meld pair are real cards and only the melded back (numbered with a b) isn't
+def frontFace(card):
+	names = card.get('names')
+	if not names:
+		return True
+	if card.get('layout') == 'meld':
+		return not str(card.get('number', '')).endswith('b')
+	return card['name'] == names[0]
+
+# generates packs locally from the card store. Sheets for every set are built when it's created so opening packs is just sampling
+class BoosterGenerator:
+
+	def __init__(self, cardDB, seed=None):
+		self.sheets = {}
+		for code, cardset in cardDB.sets.items():
+			sheets = SetSheets(cardset)
+			if len(sheets) > 0:
+				self.sheets[code.upper()] = sheets
+		self.rng = numpy.random.RandomState(seed)
+
+	def __contains__(self, setcode):
+		return setcode.upper() in self.sheets
+
+	# count packs of a set in one pass. Returns a list of packs, each a list of (name, rarity, foil), or None if we don't know the set
+	def open(self, setcode, count=1, rng=None):
+		sheets = self.sheets.get(setcode.upper())
+		if sheets is None:
+			return None
+		rng = rng or self.rng
+		rows = sheets.draw(rng, count)
+		foils = rng.random_sample(rows.shape) < FOIL_CHANCE
+		names = sheets.names[rows]
+		rarities = sheets.rarities[rows]
+		return [list(zip(names[pack].tolist(), rarities[pack].tolist(), foils[pack].tolist())) for pack in range(count)]
@@ -0,0 +1,141 @@
+import json                               # the store and the bulk dumps are both plain json
+import os                                 # atomic replace when we save the store
+import sys                                # command line for the import/update tools
+import logging                            # report what got loaded
+
+# where the bot looks for the store unless the [CardDB] section of config.ini says otherwise
+DEFAULT_PATH = 'cards.json'
+
+IMAGE_URL = 'http://gatherer.wizards.com/Handlers/Image.ashx?multiverseid=%s&type=card'
+
+# the fields we keep from each card in the bulk dump (MTGJSON AllSets format), anything else is dropped on import to keep the store small
+CARD_FIELDS = ('name', 'names', 'multiverseid', 'rarity', 'layout', 'cmc', 'colors', 'colorIdentity', 'type', 'supertypes', 'types', 'subtypes', 'text', 'flavor', 'artist', 'number', 'power', 'toughness', 'loyalty', 'legalities', 'starter')
+SET_FIELDS = ('name', 'code', 'releaseDate', 'type', 'booster')
+
+# one printing of a card. The attribute names match mtgsdk's Card so the rest of the bot doesn't care where a card came from
+class LocalCard:
+	__slots__ = ('name', 'names', 'multiverse_id', 'set', 'set_name', 'release_date', 'rarity', 'layout', 'cmc', 'colors', 'color_identity', 'type', 'supertypes', 'types', 'subtypes', 'text', 'flavor', 'artist', 'number', 'power', 'toughness', 'loyalty', 'legalities', 'printing')
+
+	def __init__(self, data, cardset):
+		self.name = data['name']
+		self.names = data.get('names')
+		self.multiverse_id = data.get('multiverseid')
+		self.set = cardset['code']
+		self.set_name = cardset['name']
+		self.release_date = cardset.get('releaseDate', '')
+		self.rarity = data.get('rarity')
+		self.layout = data.get('layout')
+		self.cmc = data.get('cmc', 0)
+		self.colors = data.get('colors')
+		self.color_identity = data.get('colorIdentity')
+		self.type = data.get('type')
+		self.supertypes = data.get('supertypes')
+		self.types = data.get('types')
+		self.subtypes = data.get('subtypes')
+		self.text = data.get('text')
+		self.flavor = data.get('flavor')
+		self.artist = data.get('artist')
+		self.number = data.get('number')
+		self.power = data.get('power')
+		self.toughness = data.get('toughness')
+		self.loyalty = data.get('loyalty')
+		self.legalities = data.get('legalities')
+		self.printing = 0 # position of this card in its name's list of printings, filled in when the indexes are built
+
+	# same url mtgsdk hands back, built on demand instead of stored
+	@property
+	def image_url(self):
+		if self.multiverse_id:
+			return IMAGE_URL % self.multiverse_id
+		return None
+
+# the offline card store. Loaded once at startup and indexed by exact name, by (name, set code) and by multiverse id so that lookups never touch the network
+class CardDB:
+
+	def __init__(self):
+		self.sets = {}         # set code -> set data straight from the store file
+		self.byName = {}       # lowercased name -> list of printings, oldest first just like mtgsdk returns them
+		self.byNameSet = {}    # (lowercased name, set code) -> printing
+		self.byMultiverse = {} # multiverse id -> printing
+
+	def __len__(self):
+		return len(self.byName)
+
+	# load the store written by the import command. Returns False if there isn't one so the bot can fall back to mtgsdk
+	def load(self, path=DEFAULT_PATH):
+		if not os.path.exists(path):
+			return False
+		with open(path, encoding='utf-8') as f:
+			self.sets = json.load(f)
+		self.buildIndexes()
+		logging.info('Card database loaded %s cards from %s sets', len(self.byName), len(self.sets))
+		return True
+
+	def save(self, path=DEFAULT_PATH):
+		temp = path + '.tmp'
+		with open(temp, 'w', encoding='utf-8') as f:
+			json.dump(self.sets, f, separators=(',', ':'))
+		os.replace(temp, path) # never leave a half written store behind if we die mid save
+
+	# merge sets from a bulk dump into the store, replacing any set we already have with the same code. A full AllSets dump and a single new set file both work
+	def merge(self, dump):
+		if 'cards' in dump and 'code' in dump: # a single set file rather than a dictionary of sets
+			dump = {dump['code']: dump}
+		for code, cardset in dump.items():
+			stored = {field: cardset[field] for field in SET_FIELDS if field in cardset}
+			stored['code'] = cardset.get('code', code)
+			stored['cards'] = [{field: card[field] for field in CARD_FIELDS if field in card} for card in cardset.get('cards', [])]
+			self.sets[stored['code']] = stored
+		self.buildIndexes()
+		return len(dump)
+
+	def buildIndexes(self):
+		self.byName = {}
+		self.byNameSet = {}
+		self.byMultiverse = {}
+		for cardset in sorted(self.sets.values(), key=lambda s: (s.get('releaseDate', ''), s['code'])): # oldest set first so the newest printing ends up last
+			for data in cardset['cards']:
+				card = LocalCard(data, cardset)
+				key = card.name.lower()
+				if (key, card.set) in self.byNameSet: # some sets print a card more than once (basic lands, alt art), keep the first
+					continue
+				printings = self.byName.setdefault(key, [])
+				card.printing = len(printings)
+				printings.append(card)
+				self.byNameSet[(key, card.set)] = card
+				if card.multiverse_id:
+					self.byMultiverse[card.multiverse_id] = card
+
+	# every printing of the exact card name, oldest first. Empty list if we've never heard of it
+	def printings(self, name):
+		return self.byName.get(name.lower(), [])
+
+	def printing(self, name, setcode):
+		return self.byNameSet.get((name.lower(), setcode.upper()))
+
+	def byMultiverseId(self, multiverseid):
+		return self.byMultiverse.get(multiverseid)
+
+	def cardNames(self):
+		return [printings[-1].name for printings in self.byName.values()]
+
+# python3 carddb.py import AllSets.json [cards.json]   - build a fresh store from a full bulk dump
+# python3 carddb.py update KLD.json [cards.json]       - add or replace the sets in a dump (e.g. a newly released set) in an existing store
+def main(argv):
+	if len(argv) < 3 or argv[1] not in ('import', 'update'):
+		print('usage: %s import|update <dump.json> [store.json]' % argv[0])
+		return 1
+	path = argv[3] if len(argv) > 3 else DEFAULT_PATH
+	db = CardDB()
+	if argv[1] == 'update' and not db.load(path):
+		print('No card store at %s, use import first.' % path)
+		return 1
+	with open(argv[2], encoding='utf-8') as f:
+		dump = json.load(f)
+	count = db.merge(dump)
+	db.save(path)
+	print('%s %s sets, store now has %s cards in %s sets.' % ('Imported' if argv[1] == 'import' else 'Updated', count, len(db), len(db.sets)))
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
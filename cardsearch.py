@@ -0,0 +1,208 @@
+import bisect                             # which row a substring match landed in
+try:
+	import numpy                          # column arrays and vectorized filtering for local searches
+except ImportError:
+	numpy = None                          # no numpy, the bot keeps sending !search to the API
+
+# every property !search understands, keyed on the lowercased name so 'orderby=' and 'orderBy=' both work. The value is the name the API (and mtgsdk's where) expects
+PROPERTIES = {
+	'layout': 'layout',               # one or list of: normal, split, flip, double-faced, token, plane, scheme, phenomenon, leveler, vanguard
+	'cmc': 'cmc',                     # one but may use operators (gt, gte, lt, lte)
+	'colors': 'colors',               # one or list of: red, blue, white, black, green
+	'color': 'colors',                # the help text has always used color=, so accept it
+	'coloridentity': 'colorIdentity', # one or list of: R,U,W,B,G
+	'type': 'type',                   # one or list, matches anywhere in the type line
+	'supertypes': 'supertypes',       # one or list
+	'types': 'types',                 # one or list
+	'subtypes': 'subtypes',           # one or list
+	'rarity': 'rarity',               # one or list of: common, uncommon, rare, mythic rare, special, basic land
+	'set': 'set',                     # one or list (this is set code, not full name)
+	'setname': 'setName',             # one or list (full name)
+	'text': 'text',                   # one or list
+	'flavor': 'flavor',               # one or list
+	'artist': 'artist',               # one or list
+	'power': 'power',                 # one but may use operators
+	'toughness': 'toughness',         # one but may use operators
+	'loyalty': 'loyalty',             # one but may use operators
+	'gameformat': 'gameFormat',       # one
+	'legality': 'legality',           # one
+	'orderby': 'orderBy',             # one
+}
+
+OPERATORS = (('gte', '__ge__'), ('lte', '__le__'), ('gt', '__gt__'), ('lt', '__lt__')) # longest first so gte isn't read as gt
+
+# how each property is matched locally
+LIST_COLUMNS = {'colors': 'colors', 'colorIdentity': 'color_identity', 'supertypes': 'supertypes', 'types': 'types', 'subtypes': 'subtypes'} # card has the value in its list
+EXACT_COLUMNS = {'layout': 'layout', 'rarity': 'rarity', 'set': 'set'}                                                                  # whole value matches
+CONTAINS_COLUMNS = {'type': 'type', 'setName': 'set_name', 'text': 'text', 'flavor': 'flavor', 'artist': 'artist'}                   # value appears anywhere in the field
+NUMBER_COLUMNS = {'cmc': 'cmc', 'power': 'power', 'toughness': 'toughness', 'loyalty': 'loyalty'}                                     # numbers that take gt/gte/lt/lte
+SORT_COLUMNS = {'name': 'name', 'cmc': 'cmc', 'power': 'power', 'toughness': 'toughness', 'loyalty': 'loyalty', 'set': 'set', 'setname': 'set_name', 'rarity': 'rarity', 'type': 'type', 'artist': 'artist', 'layout': 'layout'}
+
+# turn 'set=KLD;rarity=uncommon;color=blue,white;cmc=gte3' into {'set': 'KLD', 'rarity': 'uncommon', 'colors': 'blue,white', 'cmc': 'gte3'}. Unknown properties are dropped, same as before
+def parseQuery(query):
+	params = {}
+	for prop in query.split(';'):
+		key, equals, value = prop.partition('=')
+		key = key.strip().lower()
+		if equals and key in PROPERTIES and value.strip():
+			params[PROPERTIES[key]] = value.strip()
+	return params
+
+# 'a,b|c' -> [['a', 'b'], ['c']], the card has to match every value in at least one group
+def alternatives(value):
+	return [[part.strip().lower() for part in group.split(',') if part.strip()] for group in value.split('|')]
+
+def toNumber(value):
+	try:
+		return float(value)
+	except (TypeError, ValueError):
+		return float('nan') # '*', 'X' and missing values never compare equal or greater/less
+
+# every printing in the card store laid out column by column, so a search is a handful of array operations instead of a loop over thirty thousand cards
+class CardTable:
+
+	def __init__(self, cardDB):
+		cards = [card for printings in cardDB.byName.values() for card in printings]
+		cards.sort(key=lambda card: (card.release_date, card.set, card.name)) # release order, so without an orderBy results come back oldest printing first like the API
+		self.size = len(cards)
+		self.names = numpy.array([card.name for card in cards], dtype=object)
+		self.numbers = {}  # column -> float array, nan where the card has no (numeric) value
+		self.raw = {}      # column -> lowercased string array for the number columns, so power=* still works
+		for column in NUMBER_COLUMNS.values():
+			self.numbers[column] = numpy.array([toNumber(getattr(card, column)) for card in cards], dtype=float)
+			self.raw[column] = numpy.array([str(getattr(card, column) or '').lower() for card in cards])
+		lowered = {column: [(getattr(card, column) or '').lower() for card in cards] for column in set(EXACT_COLUMNS.values()) | set(CONTAINS_COLUMNS.values()) | {'name'}}
+		self.strings = {}  # column -> lowercased string array, only for the short columns matched whole. A fixed width array pads every value to the longest one
+		for column in EXACT_COLUMNS.values():
+			self.strings[column] = numpy.array(lowered[column])
+		self.texts = {}    # column -> (every row's lowercased value in one string, where each row starts in it) for the columns searched for substrings, rules text and flavor are far too long to pad
+		for column in CONTAINS_COLUMNS.values():
+			starts = [0]
+			for value in lowered[column][:-1]:
+				starts.append(starts[-1] + len(value) + 1)
+			self.texts[column] = ('\0'.join(lowered[column]), starts)
+		self.lists = {}    # column -> {value -> row numbers of cards with that value}
+		for column in LIST_COLUMNS.values():
+			self.lists[column] = self.invert((value.lower() for value in getattr(card, column) or ()) for card in cards)
+		self.formats = self.invert(((legality['format'].lower(), legality['legality'].lower()) for legality in card.legalities or ()) for card in cards)
+		self.orders = {} # sort column -> row numbers in sorted order, computed once so orderBy is just a lookup
+		for key, column in SORT_COLUMNS.items():
+			values = self.numbers[column] if column in self.numbers else numpy.array(lowered[column], dtype=object)
+			self.orders[key] = numpy.argsort(values, kind='mergesort')
+
+	def invert(self, valuesPerRow):
+		index = {}
+		for row, values in enumerate(valuesPerRow):
+			for value in values:
+				index.setdefault(value, []).append(row)
+		return {value: numpy.array(rows, dtype=numpy.intp) for value, rows in index.items()}
+
+	def rows(self, lookup, value):
+		mask = numpy.zeros(self.size, dtype=bool)
+		if value in lookup:
+			mask[lookup[value]] = True
+		return mask
+
+	# rows whose value in column contains part. After a match we carry on from the start of the next row, so it's one find per matching row at most
+	def contains(self, column, part):
+		text, starts = self.texts[column]
+		mask = numpy.zeros(self.size, dtype=bool)
+		position = text.find(part) if '\0' not in part else -1 # a match can't run across rows
+		while position >= 0:
+			row = bisect.bisect_right(starts, position) - 1
+			mask[row] = True
+			if row + 1 >= self.size:
+				break
+			position = text.find(part, starts[row + 1])
+		return mask
+
+	# card names matching the query, each name once, in orderBy order if one was given
+	def search(self, query):
+		return self.run(compileQuery(parseQuery(query)))
+
+	def run(self, compiled):
+		predicates, orderBy = compiled
+		mask = numpy.ones(self.size, dtype=bool)
+		for predicate in predicates:
+			mask &= predicate(self)
+			if not mask.any():
+				return []
+		if orderBy in self.orders:
+			order = self.orders[orderBy]
+			rows = order[mask[order]]
+		else:
+			rows = numpy.flatnonzero(mask)
+		names = []
+		seen = set()
+		for name in self.names[rows]: # one entry per card, not per printing
+			if name not in seen:
+				seen.add(name)
+				names.append(name)
+		return names
+
+# each predicate takes the table and returns a boolean mask over its rows
+def listPredicate(column, value):
+	groups = alternatives(value)
+	def predicate(table):
+		mask = numpy.zeros(table.size, dtype=bool)
+		for group in groups:
+			groupMask = numpy.ones(table.size, dtype=bool)
+			for part in group:
+				groupMask &= table.rows(table.lists[column], part)
+			mask |= groupMask
+		return mask
+	return predicate
+
+def stringPredicate(column, value, contains):
+	groups = alternatives(value)
+	def predicate(table):
+		mask = numpy.zeros(table.size, dtype=bool)
+		for group in groups:
+			groupMask = numpy.ones(table.size, dtype=bool)
+			for part in group:
+				groupMask &= table.contains(column, part) if contains else (table.strings[column] == part)
+			mask |= groupMask
+		return mask
+	return predicate
+
+def numberPredicate(column, value):
+	value = value.strip().lower()
+	comparison = '__eq__'
+	for operator, method in OPERATORS:
+		if value.startswith(operator):
+			comparison = method
+			value = value[len(operator):]
+			break
+	number = toNumber(value)
+	def predicate(table):
+		if number != number: # not a number (power=*), match the printed value instead
+			return table.raw[column] == value if comparison == '__eq__' else numpy.zeros(table.size, dtype=bool)
+		return getattr(table.numbers[column], comparison)(number)
+	return predicate
+
+def legalityPredicate(gameFormat, legality):
+	gameFormat = gameFormat.lower() if gameFormat else None
+	legality = legality.lower() if legality else None
+	def predicate(table):
+		mask = numpy.zeros(table.size, dtype=bool)
+		for (cardFormat, cardLegality), rows in table.formats.items():
+			if (gameFormat is None or cardFormat == gameFormat) and (legality is None or cardLegality == legality):
+				mask[rows] = True
+		return mask
+	return predicate
+
+# turn parsed parameters into (list of predicates, sort column)
+def compileQuery(params):
+	predicates = []
+	for key, value in params.items():
+		if key in LIST_COLUMNS:
+			predicates.append(listPredicate(LIST_COLUMNS[key], value))
+		elif key in EXACT_COLUMNS:
+			predicates.append(stringPredicate(EXACT_COLUMNS[key], value, False))
+		elif key in CONTAINS_COLUMNS:
+			predicates.append(stringPredicate(CONTAINS_COLUMNS[key], value, True))
+		elif key in NUMBER_COLUMNS:
+			predicates.append(numberPredicate(NUMBER_COLUMNS[key], value))
+	if 'gameFormat' in params or 'legality' in params:
+		predicates.append(legalityPredicate(params.get('gameFormat'), params.get('legality')))
+	return (predicates, params.get('orderBy', '').lower())
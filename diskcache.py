@@ -0,0 +1,154 @@
+import asyncio                            # reads and writes are handed to a thread and awaited on the bot's loop
+import concurrent.futures                 # the one thread that owns the database connection
+import json                               # keys and values are stored as json text
+import logging                            # a broken cache file is logged, the bot carries on without it
+import sqlite3                            # the cache file, standard library and safe to kill mid write
+import time                               # wall clock expiry, so entries survive a restart
+
+# defaults, overridable in the [Cache] section of config.ini
+MAX_ENTRIES = 100000  # rows kept in the file before the ones closest to expiring are thrown out
+CARD_TTL = 604800     # seconds a card's printings are kept, a week
+SEARCH_TTL = 86400    # seconds a page of Gatherer or card API search results is kept, a day
+FLUSH_DELAY = 1.0     # seconds writes are held so they go to disk together
+FLUSH_SIZE = 200      # writes held before we flush without waiting
+COMPACT_EVERY = 1000  # rows written between clean ups of expired and excess rows
+
+# a SQLite file behind the in-memory caches, so a restart doesn't start cold and send every lookup upstream again. Entries are (kind, key) -> json value with their own expiry. Writes are batched and every query runs on the cache's own thread, so a Discord handler never waits on the disk
+class DiskCache:
+
+	def __init__(self, path=None, maxEntries=MAX_ENTRIES):
+		self.path = path  # None keeps everything in memory like before
+		self.maxEntries = maxEntries
+		self.ttls = {'card': CARD_TTL, 'gatherer': SEARCH_TTL, 'search': SEARCH_TTL}
+		self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1) # sqlite connections belong to the thread that made them
+		self.connection = None # only touched on the executor thread
+		self.pending = {}      # (kind, key) -> (value, expires) waiting to be written
+		self.timer = None
+		self.written = 0       # rows written since the last clean up
+		self.hits = 0
+		self.misses = 0
+		self.writes = 0
+		self.compactions = 0
+		self.errors = 0
+
+	def configure(self, config):
+		if not config.has_section('Cache'):
+			return
+		self.path = config.get('Cache', 'DiskPath', fallback=self.path) or None
+		self.maxEntries = config.getint('Cache', 'DiskMaxEntries', fallback=self.maxEntries)
+		self.ttls['card'] = config.getfloat('Cache', 'CardTTL', fallback=self.ttls['card'])
+		self.ttls['gatherer'] = self.ttls['search'] = config.getfloat('Cache', 'SearchTTL', fallback=self.ttls['search'])
+
+	# (value, seconds left) for a key that's on disk and hasn't expired, otherwise None
+	@asyncio.coroutine
+	def lookup(self, kind, key):
+		if self.path is None:
+			return None
+		key = json.dumps(key)
+		now = time.time()
+		entry = self.pending.get((kind, key))
+		if entry is None:
+			try:
+				entry = yield from asyncio.get_event_loop().run_in_executor(self.executor, self.read, kind, key, now)
+			except (sqlite3.Error, ValueError) as error:
+				self.errors = self.errors + 1
+				logging.warning('Disk cache read failed: %r', error)
+				entry = None
+		if entry is None or entry[1] <= now:
+			self.misses = self.misses + 1
+			return None
+		self.hits = self.hits + 1
+		return (entry[0], entry[1] - now)
+
+	# the value for key from disk, or from the loader coroutine if it isn't there (which is then saved for next time)
+	@asyncio.coroutine
+	def get(self, kind, key, loader, ttl=None):
+		entry = yield from self.lookup(kind, key)
+		if entry is not None:
+			return entry[0]
+		value = yield from loader()
+		self.put(kind, key, value, ttl)
+		return value
+
+	# queue a value to be written with the next batch. ttl defaults to the one for its kind
+	def put(self, kind, key, value, ttl=None):
+		if self.path is None:
+			return
+		self.pending[(kind, json.dumps(key))] = (value, time.time() + (ttl if ttl is not None else self.ttls.get(kind, SEARCH_TTL)))
+		if len(self.pending) >= FLUSH_SIZE:
+			self.flush()
+		elif self.timer is None:
+			self.timer = asyncio.get_event_loop().call_later(FLUSH_DELAY, self.flush)
+
+	# hand everything waiting to the cache's thread. Reads queue up behind it on the same thread, so they always see it
+	def flush(self):
+		if self.timer is not None:
+			self.timer.cancel()
+			self.timer = None
+		if not self.pending:
+			return
+		rows = [(kind, key, json.dumps(value), expires) for (kind, key), (value, expires) in self.pending.items()]
+		self.pending = {}
+		asyncio.get_event_loop().run_in_executor(self.executor, self.write, rows).add_done_callback(self.flushed)
+
+	def flushed(self, future):
+		if future.exception() is not None:
+			self.errors = self.errors + 1
+			logging.warning('Disk cache write failed: %r', future.exception())
+
+	# write whatever is still waiting and close the file. Call on the way out, once the loop has stopped
+	def close(self):
+		if self.timer is not None:
+			self.timer.cancel()
+			self.timer = None
+		if self.path is not None and self.pending:
+			rows = [(kind, key, json.dumps(value), expires) for (kind, key), (value, expires) in self.pending.items()]
+			self.pending = {}
+			self.executor.submit(self.write, rows)
+		self.executor.submit(self.disconnect)
+		self.executor.shutdown(wait=True)
+
+	# everything below runs on the cache's thread
+
+	def connect(self):
+		if self.connection is None:
+			self.connection = sqlite3.connect(self.path)
+			self.connection.execute('PRAGMA journal_mode=WAL') # readers don't wait on a write, and a crash mid write can't corrupt the file
+			self.connection.execute('PRAGMA synchronous=NORMAL')
+			self.connection.execute('CREATE TABLE IF NOT EXISTS cache (kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires REAL NOT NULL, PRIMARY KEY (kind, key))')
+			self.connection.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+			self.compact()
+		return self.connection
+
+	def disconnect(self):
+		if self.connection is not None:
+			self.connection.close()
+			self.connection = None
+
+	def read(self, kind, key, now):
+		row = self.connect().execute('SELECT value, expires FROM cache WHERE kind = ? AND key = ? AND expires > ?', (kind, key, now)).fetchone()
+		if row is None:
+			return None
+		return (json.loads(row[0]), row[1])
+
+	def write(self, rows):
+		connection = self.connect()
+		with connection: # one transaction for the whole batch
+			connection.executemany('INSERT OR REPLACE INTO cache (kind, key, value, expires) VALUES (?, ?, ?, ?)', rows)
+		self.writes = self.writes + len(rows)
+		self.written = self.written + len(rows)
+		if self.written >= COMPACT_EVERY:
+			self.compact()
+
+	# drop expired rows, then the ones closest to expiring until we're back under maxEntries
+	def compact(self):
+		self.written = 0
+		with self.connection:
+			self.connection.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+			excess = self.connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - self.maxEntries
+			if excess > 0:
+				self.connection.execute('DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY expires LIMIT ?)', (excess,))
+		self.compactions = self.compactions + 1
+
+	def stats(self):
+		return {'pending': len(self.pending), 'hits': self.hits, 'misses': self.misses, 'writes': self.writes, 'compactions': self.compactions, 'errors': self.errors}
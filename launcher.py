@@ -0,0 +1,131 @@
+import asyncio                            # each worker runs its shards' clients on its own loop
+import concurrent.futures                 # threads for a worker's calls to the shared store
+import logging                            # say what the supervisor is doing
+import multiprocessing                    # one worker process per core
+import os                                 # core count, random auth key for the shared store
+import signal                             # mtgstop sends SIGTERM, we pass it on to the workers
+import sys                                # exit the worker cleanly on SIGTERM
+import time                               # restart backoff
+from configparser import SafeConfigParser # the same config.ini as mtg.py
+from shared import SharedManager, SharedCache, SharedFlights, MAX_ENTRIES # the cache and single flight every worker shares
+
+# Discord only lets a bot identify one shard every 5 seconds, so shard n waits n times this long before it connects
+IDENTIFY_DELAY = 5.5
+RESTART_MAX = 60   # longest we wait before restarting a worker that keeps dying
+
+# python3 launcher.py [config.ini] - runs the bot as Workers processes between them owning Count shards, with the supervisor (this process) holding the cache and in flight lookups they all share. mtgstart/mtgstop run this instead of mtg.py
+def main(argv):
+	logging.basicConfig(level=logging.INFO)
+	configPath = argv[1] if len(argv) > 1 else 'config.ini'
+	config = SafeConfigParser()
+	config.read(configPath)
+	workers = config.getint('Shards', 'Workers', fallback=os.cpu_count() or 1)
+	shardCount = config.getint('Shards', 'Count', fallback=workers)
+	workers = min(workers, shardCount) # a worker with no shards would have nothing to do
+	authkey = os.urandom(16)
+	manager = SharedManager(address=('127.0.0.1', 0), authkey=authkey)
+	manager.start(signal.signal, (signal.SIGINT, signal.SIG_IGN)) # ctrl+c goes to us, we shut the manager down after the workers
+	manager.store(config.getint('Shards', 'SharedSize', fallback=MAX_ENTRIES)) # create it now so it gets the configured size
+	shards = [[shard for shard in range(shardCount) if shard % workers == worker] for worker in range(workers)]
+	supervisor = Supervisor(shards, shardCount, manager.address, authkey, configPath)
+	signal.signal(signal.SIGTERM, lambda number, frame: supervisor.stop())
+	signal.signal(signal.SIGINT, lambda number, frame: supervisor.stop())
+	try:
+		supervisor.run()
+	finally:
+		manager.shutdown()
+	return 0
+
+# starts the workers, restarts any that die (waiting longer each time one dies quickly) and stops them all when told to
+class Supervisor:
+
+	def __init__(self, shards, shardCount, address, authkey, configPath):
+		self.shards = shards
+		self.shardCount = shardCount
+		self.address = address
+		self.authkey = authkey
+		self.configPath = configPath
+		self.processes = [None] * len(shards)
+		self.failures = [0] * len(shards)
+		self.restartAt = [0.0] * len(shards)
+		self.stopping = False
+
+	def start(self, worker):
+		process = multiprocessing.Process(target=runWorker, args=(worker, len(self.shards), self.shards[worker], self.shardCount, self.address, self.authkey, self.configPath), name='mtgbot-worker-%s' % worker)
+		process.start()
+		self.processes[worker] = process
+		self.restartAt[worker] = time.monotonic()
+		logging.info('Started worker %s (pid %s) for shards %s', worker, process.pid, self.shards[worker])
+
+	def run(self):
+		for worker in range(len(self.shards)):
+			self.start(worker)
+		while not self.stopping:
+			time.sleep(1)
+			for worker, process in enumerate(self.processes):
+				if self.stopping or process.is_alive():
+					continue
+				if time.monotonic() - self.restartAt[worker] > RESTART_MAX: # it ran for a good while, this isn't a crash loop
+					self.failures[worker] = 0
+				delay = min(RESTART_MAX, 2 ** self.failures[worker])
+				if time.monotonic() < self.restartAt[worker] + delay:
+					continue
+				logging.warning('Worker %s exited with %s, restarting it', worker, process.exitcode)
+				self.failures[worker] = self.failures[worker] + 1
+				self.start(worker)
+		for process in self.processes:
+			if process.is_alive():
+				process.terminate() # SIGTERM, the worker logs out and writes its disk cache
+		for process in self.processes:
+			process.join(30)
+
+	def stop(self):
+		self.stopping = True
+
+# the body of one worker process: the bot, plugged into the shared cache and single flight, with a client for each of its shards
+def runWorker(worker, workers, shardIds, shardCount, address, authkey, configPath):
+	signal.signal(signal.SIGINT, signal.SIG_IGN) # the supervisor decides when we stop
+	signal.signal(signal.SIGTERM, lambda number, frame: sys.exit(0))
+	import mtg # only in the worker, the supervisor never touches Discord
+	config = SafeConfigParser()
+	config.read(configPath)
+	manager = SharedManager(address=address, authkey=authkey)
+	manager.connect()
+	store = manager.store()
+	executor = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+	mtg.flights = SharedFlights(store, executor)
+	mtg.diskCache = SharedCache(store, mtg.diskCache, executor)
+	mtg.setup(config)
+	shareLimits(mtg, workers)
+	if mtg.metricsPort:
+		mtg.metricsPort = mtg.metricsPort + worker # one metrics port per worker, counting up from the configured one
+	clients = [mtg.connect(shardId, shardCount) for shardId in shardIds]
+	mtg.client = clients[0]
+	token = config.get('Discord', 'SecretToken')
+	loop = asyncio.get_event_loop()
+	try:
+		loop.run_until_complete(asyncio.gather(*[startShard(shardClient, shardId, token) for shardClient, shardId in zip(clients, shardIds)]))
+	finally:
+		for shardClient in clients:
+			try:
+				loop.run_until_complete(shardClient.logout())
+			except Exception:
+				pass
+		mtg.diskCache.close()
+
+# every worker has its own scheduler and warmer, so each gets its share of the configured limits and all of them together hit a site no harder than one bot would
+def shareLimits(mtg, workers):
+	scheduler = mtg.fetcher.scheduler
+	scheduler.rate = scheduler.rate / workers
+	scheduler.burst = max(1, scheduler.burst // workers)
+	scheduler.concurrency = max(1, scheduler.concurrency // workers)
+	mtg.warmer.budget = max(1, mtg.warmer.budget // workers)
+	mtg.warmer.concurrency = max(1, mtg.warmer.concurrency // workers)
+
+@asyncio.coroutine
+def startShard(shardClient, shardId, token):
+	yield from asyncio.sleep(shardId * IDENTIFY_DELAY)
+	yield from shardClient.start(token)
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
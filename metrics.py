@@ -0,0 +1,157 @@
+import asyncio                            # the metrics endpoint runs on the bot's loop
+import bisect                             # find the histogram bucket for a value
+import collections                        # counters
+import logging                            # say where the endpoint is listening
+import time                               # span timing
+
+# histogram buckets in seconds, from a local lookup up to a page that hit the timeout
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PREFIX = 'mtgbot_'
+
+class Histogram:
+
+	def __init__(self):
+		self.buckets = [0] * (len(BUCKETS) + 1) # the last one is everything over the biggest bucket
+		self.count = 0
+		self.sum = 0.0
+
+	def observe(self, seconds):
+		self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+		self.count = self.count + 1
+		self.sum = self.sum + seconds
+
+	# rough percentile from the buckets, good enough for !stats
+	def quantile(self, fraction):
+		if self.count == 0:
+			return 0.0
+		target = fraction * self.count
+		seen = 0
+		for bucket in range(len(BUCKETS)):
+			seen = seen + self.buckets[bucket]
+			if seen >= target:
+				return BUCKETS[bucket]
+		return float('inf')
+
+# times a block of code into a histogram, and counts it as an error or timeout if it raises
+class Span:
+
+	def __init__(self, metrics, name, labels):
+		self.metrics = metrics
+		self.name = name
+		self.labels = labels
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, kind, error, traceback):
+		self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+		if kind is not None:
+			self.metrics.count('errors_total', span=self.name, kind='timeout' if issubclass(kind, asyncio.TimeoutError) else kind.__name__, **self.labels)
+		return False
+
+# everything the bot measures about itself: latency histograms, error and timeout counters and the stats of its caches. Exposed as Prometheus text on a local port and summarized by !stats
+class Metrics:
+
+	def __init__(self):
+		self.histograms = {} # (name, labels) -> Histogram
+		self.counters = collections.Counter() # (name, labels) -> count
+		self.gauges = {}     # name -> function returning a dictionary of numbers (cache stats)
+		self.server = None
+
+	@staticmethod
+	def key(name, labels):
+		return (name, tuple(sorted(labels.items())))
+
+	# with metrics.span('stage_seconds', stage='goldfish'): ...
+	def span(self, name, **labels):
+		return Span(self, name, labels)
+
+	def observe(self, name, seconds, **labels):
+		key = self.key(name, labels)
+		if key not in self.histograms:
+			self.histograms[key] = Histogram()
+		self.histograms[key].observe(seconds)
+
+	def count(self, name, amount=1, **labels):
+		self.counters[self.key(name, labels)] += amount
+
+	def gauge(self, name, stats):
+		self.gauges[name] = stats
+
+	# the Prometheus text exposition format
+	def render(self):
+		lines = []
+		for name in sorted(set(key[0] for key in self.histograms)):
+			lines.append('# TYPE %s%s histogram' % (PREFIX, name))
+			for (histogramName, labels), histogram in sorted(self.histograms.items()):
+				if histogramName != name:
+					continue
+				seen = 0
+				for bucket in range(len(BUCKETS)):
+					seen = seen + histogram.buckets[bucket]
+					lines.append('%s%s_bucket%s %s' % (PREFIX, name, formatLabels(labels + (('le', repr(BUCKETS[bucket])),)), seen))
+				lines.append('%s%s_bucket%s %s' % (PREFIX, name, formatLabels(labels + (('le', '+Inf'),)), histogram.count))
+				lines.append('%s%s_sum%s %s' % (PREFIX, name, formatLabels(labels), histogram.sum))
+				lines.append('%s%s_count%s %s' % (PREFIX, name, formatLabels(labels), histogram.count))
+		for name in sorted(set(key[0] for key in self.counters)):
+			lines.append('# TYPE %s%s counter' % (PREFIX, name))
+			for (counterName, labels), value in sorted(self.counters.items()):
+				if counterName == name:
+					lines.append('%s%s%s %s' % (PREFIX, name, formatLabels(labels), value))
+		for name, stats in sorted(self.gauges.items()):
+			lines.append('# TYPE %s%s gauge' % (PREFIX, name))
+			for stat, value in sorted(flatten(stats()).items()):
+				lines.append('%s%s%s %s' % (PREFIX, name, formatLabels((('stat', stat),)), value))
+		return '\n'.join(lines) + '\n'
+
+	# a few lines for Discord: request counts and rough p50/p95 per span, errors and cache stats
+	def summary(self):
+		lines = []
+		for (name, labels), histogram in sorted(self.histograms.items()):
+			lines.append('%s %s: %s calls, p50 %.0fms, p95 %.0fms' % (name.replace('_seconds', ''), ','.join(value for label, value in labels), histogram.count, histogram.quantile(0.5) * 1000, histogram.quantile(0.95) * 1000))
+		errors = [(labels, value) for (name, labels), value in sorted(self.counters.items()) if name == 'errors_total']
+		if errors:
+			lines.append('errors: ' + ', '.join('%s %s' % ('/'.join(value for label, value in labels), count) for labels, count in errors))
+		for name, stats in sorted(self.gauges.items()):
+			lines.append('%s: %s' % (name, ', '.join('%s %s' % item for item in sorted(flatten(stats()).items()))))
+		return '\r\n'.join(lines) if lines else 'Nothing measured yet.'
+
+	# serve GET /metrics on a local port for Prometheus to scrape. Safe to call more than once
+	@asyncio.coroutine
+	def serve(self, host, port):
+		if self.server is not None or not port:
+			return
+		self.server = yield from asyncio.start_server(self.handle, host, port)
+		logging.info('Metrics available at http://%s:%s/metrics', host, port)
+
+	@asyncio.coroutine
+	def handle(self, reader, writer):
+		try:
+			request = yield from reader.readline()
+			while (yield from reader.readline()) not in (b'\r\n', b'\n', b''): # skip the headers
+				pass
+			if request.split(b' ')[1:2] == [b'/metrics']:
+				body = self.render().encode('utf-8')
+				writer.write(b'HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\nContent-Length: %d\r\n\r\n' % len(body) + body)
+			else:
+				writer.write(b'HTTP/1.0 404 Not Found\r\nContent-Length: 0\r\n\r\n')
+			yield from writer.drain()
+		finally:
+			writer.close()
+
+def formatLabels(labels):
+	if not labels:
+		return ''
+	return '{%s}' % ','.join('%s="%s"' % (label, str(value).replace('\\', '\\\\').replace('"', '\\"')) for label, value in labels)
+
+# {'started': {'card': 3}, 'size': 2} -> {'started_card': 3, 'size': 2}
+def flatten(stats, prefix=''):
+	flat = {}
+	for name, value in stats.items():
+		if isinstance(value, dict):
+			flat.update(flatten(value, prefix + name + '_'))
+		else:
+			flat[prefix + name] = value
+	return flat
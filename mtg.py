@@ -1,13 +1,31 @@
 import discord                            # interface and connect with Discord
 import asyncio                            # perform functions asynchronously 
 import logging                            # log some stuff
-import re                                 # regex
-import requests                           # do some stuff on the interwebs
 import random                             # RNG
+import json                               # search results come straight from the card API a page at a time
+import collections                        # ordered set of new set price keys
+import datetime                           # which sets count as newly released for price warming
+from urllib.parse import urlencode, urlsplit # search parameters for the card API url, and the price site's host for the scheduler
 from configparser import SafeConfigParser # easy file parsing for the secret token and potentially more options (card page size?)
-from bs4 import BeautifulSoup             # parse all of the html
 from mtgsdk import Card                   # interface with Gatherer through the existing mtgsdk
 from mtgsdk import Set
+import mtgsdk.querybuilder                # where the card API lives, the benchmarks point it at a stand-in
+from mtgfetch import Fetcher              # shared http session and thread pool so lookups don't block the gateway
+from scheduler import Overloaded, INTERACTIVE, BULK # an upstream site is too busy or throttling us, so we say so instead of hanging
+from carddb import CardDB                 # offline card store so name lookups don't need the network
+from nameindex import NameIndex           # partial and misspelled card name search over the card store
+from pricecache import PriceCache         # keep MTG Goldfish prices around so popular cards aren't scraped over and over
+from diskcache import DiskCache           # prices, cards and searches saved to disk so a restart doesn't start cold
+from warmer import Warmer                 # refreshes popular and newly printed cards' prices before anyone has to wait on them
+from priceparse import extractPrices, extractSearch # pull just the bits we need out of MTG Goldfish and Gatherer pages
+import cardsearch                         # !search query compiler and the local column table it runs against
+from sessions import SessionStore         # per channel card lists, pages and flip targets
+from results import Results               # card lists that fetch the rest of their pages as people page through them
+from singleflight import SingleFlight     # identical lookups at the same time share one upstream call
+import booster                            # local booster packs built from the card store
+from router import Router                 # matches messages to commands with precompiled patterns
+from metrics import Metrics               # timings, error counts and cache stats for !stats and Prometheus
+from shared import shardFor               # which of this process's shards a reply goes out on when launcher.py runs us sharded
 
 # only show initial Discord connection info
 logging.basicConfig(level=logging.INFO)
@@ -15,129 +33,273 @@ logging.basicConfig(level=logging.INFO)
 # set up the Discord connection object
 client = discord.Client()
 
+# when launcher.py runs the bot as several processes, each one connects to some of the shards with a client per shard. Empty when we run on our own as one client
+shardClients = {} # shard id -> client
+shardCount = 1
+
+# timing spans around each stage of a lookup, error and timeout counters and cache stats. Served as Prometheus text on the [Metrics] port and summarized by !stats
+metrics = Metrics()
+metricsHost = '127.0.0.1'
+metricsPort = 0  # 0 leaves the endpoint off
+admins = set()   # user ids allowed to use !stats besides server administrators
+
+# every command registers itself with this, on_message just asks it who should handle a message
+router = Router()
+
+# all outbound traffic (mtggoldfish, gatherer, mtgsdk) goes through this so it runs alongside the gateway instead of blocking it
+fetcher = Fetcher()
+
+# lookups currently waiting on an upstream, so a burst of people asking for the same card only costs one call. flights.stats() has the coalesced counts
+flights = SingleFlight()
+
+# local copy of every card, filled from the store built by 'python3 carddb.py import'. If there is no store we fall back to mtgsdk
+cardDB = CardDB()
+nameIndex = NameIndex() # every card name in cardDB, for searches that don't match a card exactly
+cardTable = None        # cardDB laid out in columns for !search, only built if numpy is installed
+boosters = None         # booster sheets for every set in cardDB, only built if numpy is installed
+maxPacks = 24           # most packs one !booster can open, a full 8 player draft
+
+# the last card list, page and flip card for each channel (or each user in a channel). Bounded by count, memory and age in the [Sessions] section of config.ini
+sessions = SessionStore()
+PAGE_SIZE = 25            # cards listed per message, !cont shows the next lot
+SEARCH_PAGE_SIZE = 100    # cards per card API page, the most it will give us
+GATHERER_PAGE_SIZE = 100  # cards per Gatherer search page
+prefetchPages = True      # load the next page of a remote search in the background while people read this one, [Search] Prefetch in config.ini
+
+# MTG Goldfish prices keyed on (set, name, foil). Size, TTL and stale-while-revalidate are set in the [Cache] section of config.ini, priceCache.stats() has the hit/miss counts
+priceCache = PriceCache()
+
+# SQLite file behind priceCache and in front of every remote card lookup and search, so what we learned survives mtgrestart. Off unless [Cache] DiskPath is set
+diskCache = DiskCache()
+CARD_RECORD = (('name', 'name'), ('names', 'names'), ('multiverseid', 'multiverse_id'), ('set', 'set'), ('setName', 'set_name'), ('rarity', 'rarity'), ('imageUrl', 'image_url')) # (API field, mtgsdk attribute) for the parts of a card we use, which is all we keep on disk
+
+# tracks which cards people look up and keeps their prices fresh in the background, [Warmer] in config.ini
+warmer = Warmer(priceCache, lambda key: refreshPrices(key), lambda days: newSetCards(days), lambda: pricesBusy()) # the functions are defined further down
+
 # bot strings
-help = 'My command operator is the ! character.\r\nhelp: Displays this message\r\nsuperhelp: shows a list of all properties that may be used in a search query\r\ntest: Make sure I\'m alive!\r\nTo fetch a card, use double square brackets.\r\nYou can gather card information and an image by using its exact name, or you can search cards with a search term.\r\nBy default, the most recent printing of a card is displayed, but if there are multiple prints, the sets will be listed underneath the card. If you would like info on an older print, include the set code immediately following the double brackets.\r\nsearch: Uses parameters that you input to search all MTG cards. Split each property using the semicolon character (;).\r\nSome properties can take lists. Use a comma (,) to signify AND. Use a pipe (|) to signify OR.\r\nPower, toughness, CMC and loyalty can use the following operators: gt (greater than), lt (less than), gte (greater than or equal to), lte (less than or equal to).\r\nEx. !search set=KLD;rarity=uncommon;color=blue,white;cmc=gte3\r\nUse the superhelp command to list all possible properties.\r\nbooster: Generate a booster pack of a desired set code. Ex. !booster KLD\r\nWhen a search query returns multiple cards, a specific card can be called using the command operator followed by a number.'
+help = 'My command operator is the ! character.\r\nhelp: Displays this message\r\nsuperhelp: shows a list of all properties that may be used in a search query\r\ntest: Make sure I\'m alive!\r\nTo fetch a card, use double square brackets.\r\nYou can gather card information and an image by using its exact name, or you can search cards with a search term.\r\nBy default, the most recent printing of a card is displayed, but if there are multiple prints, the sets will be listed underneath the card. If you would like info on an older print, include the set code immediately following the double brackets.\r\nsearch: Uses parameters that you input to search all MTG cards. Split each property using the semicolon character (;).\r\nSome properties can take lists. Use a comma (,) to signify AND. Use a pipe (|) to signify OR.\r\nPower, toughness, CMC and loyalty can use the following operators: gt (greater than), lt (less than), gte (greater than or equal to), lte (less than or equal to).\r\nEx. !search set=KLD;rarity=uncommon;color=blue,white;cmc=gte3\r\nUse the superhelp command to list all possible properties.\r\nbooster: Generate a booster pack of a desired set code, or several for a draft. Ex. !booster KLD or !booster KLD 24\r\nWhen a search query returns multiple cards, a specific card can be called using the command operator followed by a number.'
 
 superhelp = 'The following properties can be used in a search. Properties with an (L) can be used as lists. Power, toughness, CMC and loyalty may use the operators defined in the regular help.\r\nlayout (L), cmc, colors (L), colorIdentity (L), type (L), supertypes (L), types (L), subtypes (L), rarity (L), set (L), setName (L), text (L), flavor (L), artist (L), power, toughness, loyalty, gameFormat, legality, orderBy'
 
+# where we scrape from. The benchmarks point these at a local stand-in
+GOLDFISH_URL = 'https://www.mtggoldfish.com'
+GATHERER_URL = 'http://gatherer.wizards.com'
+BUSY = 'I\'m busy right now, try again shortly.' # what we say when the card sites are swamped or throttling us
+
 # global variables
-tempCardList = [] # this is used when multiple card matches are found. We use this to call cards by their index, and to paginate lists of cards to keep down the spam
-tempCardFlip = '' # this is to store the name of the reverse side of the card in the case of flippable cards
-itemsShown = 0    # this is used to store the current 'page' of cards listed in increments of 25
 secrettoken = ''  # this is the token the Discord client uses to authenticate and know which server it's going to, this is read in from the config.ini file
 
 # when the bot is initiated we use this event to perform startup activities - currently just for logging
 @client.event
 @asyncio.coroutine
 def on_ready():
+	yield from ready(client)
+
+@asyncio.coroutine
+def ready(readyClient):
 	print('Logged in as')
-	print(client.user.name)
-	print(client.user.id)
+	print(readyClient.user.name)
+	print(readyClient.user.id)
 	print('------')
-	print(client)	
-	yield from client.change_presence(game=discord.Game(name='Hearthstone'))
+	print(readyClient)	
+	yield from readyClient.change_presence(game=discord.Game(name='Hearthstone'))
+	yield from metrics.serve(metricsHost, metricsPort) # only starts once, on_ready fires again after a reconnect
+	warmer.start() # same here
+
+# a client for one shard of the bot, with the same event handlers as the default client. Used by launcher.py
+def connect(shardId, count):
+	global shardCount
+	shardClient = discord.Client(shard_id=shardId, shard_count=count)
+	shardClients[shardId] = shardClient
+	shardCount = count
+	shardClient.event(on_message)
+	@shardClient.event
+	@asyncio.coroutine
+	def on_ready():
+		yield from ready(shardClient)
+	return shardClient
 
-# this event is triggered whenever a message is sent - we look for the command operators and perform actions based on user input
+# the client a channel's messages came in on, so the reply goes back out on the same shard. Direct messages always come in on shard 0
+def clientFor(channel):
+	if not shardClients:
+		return client
+	server = getattr(channel, 'server', None)
+	return shardClients.get(shardFor(server.id, shardCount) if server is not None else 0, client)
+
+# this event is triggered whenever a message is sent - the router looks for the command operators and hands the message to the matching handler below
 @client.event
 @asyncio.coroutine
 def on_message(message):
+	route = router.route(message.content)
+	if route is None: # not a command, nothing to do
+		return
+	handler, argument = route
+	try:
+		with metrics.span('command_seconds', command=handler.__name__):
+			yield from handler(message, argument)
+	except Overloaded as error:
+		logging.warning('Turned away %s: %s', handler.__name__, error)
+		yield from send(message.channel, BUSY)
+
+# every reply goes through here so we can see how long Discord takes with them
+@asyncio.coroutine
+def send(channel, content):
+	with metrics.span('stage_seconds', stage='discord_send'):
+		return (yield from clientFor(channel).send_message(channel, content))
+
+# ensure the bot is alive and not busy performing a request
+@router.command('test')
+@asyncio.coroutine
+def testCommand(message, argument):
+	yield from send(message.channel, 'I\'m alive!')
 	
-	# ensure the bot is alive and not busy performing a request
-	if message.content.startswith('!test'):
-		yield from client.send_message(message.channel, 'I\'m alive!')
-		
-	# display the help string
-	elif message.content.startswith('!help'):
-		yield from client.send_message(message.channel, help)
-		
-	# display the superhelp string
-	elif message.content.startswith('!superhelp'):
-		yield from client.send_message(message.channel, superhelp)
-		
-	# tell the bot what to show it is playing
-	elif message.content.startswith('!play '):
-		gamename = message.content.split('!play ')
-		if(len(gamename) > 1):
-			yield from client.change_presence(game=discord.Game(name=gamename[1]))
-			
-	# look for the [[]] notation to list a card using either its exact name or a search term for multiple cards
-	elif '[[' in message.content:											
-		cardname = re.findall(r"[[^[]*\[([^]]*)\]]", message.content) # regex matches the text in between [[ and ]]		
-		if len(cardname) > 0:
-			userset = message.content.split(']]') # look for a setcode following the card notation Ex. [[Doom Blade]]M10
-			if userset[1]: # search card name and set code				
-				toSend = findCardsByName(cardname[0], userset[1])
-				if toSend.startswith('Single match'): # if we put in a partial card name that only returns one result, we need to display the result. We rely on the pipe character to separate the full card name and the set code 
-					toSend = findCardsByName(toSend.split('|')[1], toSend.split('|')[2])					
-					yield from client.send_message(message.channel, toSend)
-				else:
-					yield from client.send_message(message.channel, toSend)
-			else: # search card name only
-				toSend = findCardsByName(cardname[0])
-				if toSend.startswith('Single match'): # I don't like this. It's messy and relies on a string output. If a card ever has a pipe in the name, we're screwed
-					toSend = findCardsByName(toSend.split('|')[1], toSend.split('|')[2])					
-					yield from client.send_message(message.channel, toSend)
-				else:				
-					yield from client.send_message(message.channel, toSend)
-	
-	# show the result of the opposite side of a flip or meld card without the user having to type it explicitly
-	elif message.content.startswith('!flip'):
-		if tempCardFlip:
-			toSend = findCardsByName(tempCardFlip)			
-			yield from client.send_message(message.channel, toSend)
-		else:
-			yield from client.send_message(message.channel, 'No flippable card.')
+# display the help string
+@router.command('help')
+@asyncio.coroutine
+def helpCommand(message, argument):
+	yield from send(message.channel, help)
 	
-	# parse a user's advanced search query. Use the mtgsdk to retrieve a list of cards Ex. !search set=KLD;rarity=uncommon;color=blue,white;cmc=gte3
-	elif message.content.startswith('!search '):		
-		searchterms = message.content.split('!search ')		
-		if (len(searchterms) > 1):
-			toSend = advancedSearch(searchterms[1])
-			toSend = toSend[:toSend.rfind(',')] # need to find a more consistent way to do this
-			yield from client.send_message(message.channel, toSend)		
-
-	# crack open a booster and see what you get! Uses the built in mtgsdk booster function which may or may not be flawed like in the case of SOI (only generates 13-14 cards) Ex. !booster KLD
-	elif message.content.startswith('!booster '):
-		setcode = message.content.split('!booster ')
-		if(len(setcode) > 1):			
-			toSend = openBooster(setcode[1])
-			toSend = toSend[:toSend.rfind(',')]
-			yield from client.send_message(message.channel, toSend)						
+# display the superhelp string
+@router.command('superhelp')
+@asyncio.coroutine
+def superhelpCommand(message, argument):
+	yield from send(message.channel, superhelp)
 	
-	# if the user uses a number following the command operator, this means they want to retrieve the card at a certain index in a list of cards 	
-	elif len(re.findall(r"![0-9]{1,3}", message.content)) > 0: # this regex looks for a number between 0-999
-		if len(tempCardList) == 0:
-			yield from client.send_message(message.channel, 'No card list to search. Generate a list of cards first.')
+# tell the bot what to show it is playing
+@router.command('play')
+@asyncio.coroutine
+def playCommand(message, gamename):
+	if gamename:
+		yield from clientFor(message.channel).change_presence(game=discord.Game(name=gamename))
+		
+# look for the [[]] notation to list cards using either their exact name or a search term for multiple cards. Every [[Name]] in the message is looked up at the same time and the answers go back in one reply Ex. [[Doom Blade]]M10 [[Fatal Push]]
+@router.cards
+@asyncio.coroutine
+def cardCommand(message, pairs):
+	session = sessions.open(message)
+	lookups = yield from asyncio.gather(*[findCardsByName(cardname, usersetcode) for (cardname, usersetcode) in pairs], return_exceptions=True)
+	replies = []
+	flip = ''
+	lists = [] # (reply index, results) for every partial name that matched several cards
+	for pair in range(0,len(pairs)): # one slow or broken lookup shouldn't sink the rest of the decklist
+		if isinstance(lookups[pair], Overloaded):
+			replies.append('Couldn\'t look up %s, the card sites are busy. Try again shortly.' % pairs[pair][0])
+		elif isinstance(lookups[pair], Exception):
+			logging.error('Lookup of %s failed: %r', pairs[pair][0], lookups[pair])
+			replies.append('Couldn\'t look up %s right now.' % pairs[pair][0])
 		else:
-			input = re.findall(r"![0-9]{1,3}", message.content)
-			number = input[0].split('!')
-			if len(tempCardList) >= (int(number[1]) - 1): # list index starts at 0, card list starts at 1
-				toSend = findCardsByName(tempCardList[int(number[1]) - 1])
-				toSend = toSend[:toSend.rfind(',')]
-				yield from client.send_message(message.channel, toSend)
-	
-	# a user uses this if a list of cards exceeds 25 results. This is used to paginate lists of cards to keep spam down
-	elif message.content.startswith('!cont'):
-		if(len(tempCardList) > 25):
-			toSend = nextPage()
-			toSend = toSend[:toSend.rfind(',')]
-			yield from client.send_message(message.channel, toSend)						
-				
+			toSend, cardFlip, results = lookups[pair]
+			flip = cardFlip or flip # !flip goes to the last flip card in the message
+			if results is not None:
+				lists.append((len(replies), results))
+			replies.append(toSend)
+	# the session is only touched once every lookup is back, so they can't trip over each other. Several lists become one list numbered straight through, so !N means the same card it says next to it (a remote search only brings the pages it has loaded so far)
+	session.flip = flip
+	if len(lists) == 1:
+		replies[lists[0][0]] = yield from listCards(lists[0][1], session)
+	elif len(lists) > 1:
+		replies[lists[0][0]] = yield from listCards(Results([name for index, results in lists for name in results.loaded()]), session)
+	for chunk in splitMessage('\r\n\r\n'.join(reply for reply in replies if reply is not None)):
+		yield from send(message.channel, chunk)
+
+# show how the bot is doing: lookup timings per stage, errors and cache hit rates. Admins only
+@router.command('stats')
+@asyncio.coroutine
+def statsCommand(message, argument):
+	isAdmin = message.author.id in admins or (message.server is not None and message.channel.permissions_for(message.author).administrator)
+	if isAdmin:
+		for chunk in splitMessage(metrics.summary()):
+			yield from send(message.channel, chunk)
+
+# show the result of the opposite side of a flip or meld card without the user having to type it explicitly
+@router.command('flip')
+@asyncio.coroutine
+def flipCommand(message, argument):
+	session = sessions.find(message)
+	if session and session.flip:
+		toSend = yield from lookupCard(session.flip, session)			
+		yield from send(message.channel, toSend)
+	else:
+		yield from send(message.channel, 'No flippable card.')
+
+# parse a user's advanced search query Ex. !search set=KLD;rarity=uncommon;color=blue,white;cmc=gte3
+@router.command('search')
+@asyncio.coroutine
+def searchCommand(message, searchterms):
+	if searchterms:
+		toSend = yield from advancedSearch(searchterms, sessions.open(message))
+		for chunk in splitMessage(toSend):
+			yield from send(message.channel, chunk)
+
+# crack open a booster and see what you get! Add a number to open several at once for a draft Ex. !booster KLD or !booster KLD 24
+@router.command('booster')
+@asyncio.coroutine
+def boosterCommand(message, argument):
+	setcode = argument.split()
+	if(len(setcode) > 0):			
+		count = int(setcode[1]) if len(setcode) > 1 and setcode[1].isdigit() else 1
+		toSend = yield from openBooster(setcode[0], sessions.open(message), max(1, min(count, maxPacks)))
+		for chunk in splitMessage(toSend): # a whole draft is far more than Discord lets us send in one message
+			yield from send(message.channel, chunk)						
 
-# takes a mandatory search parameter and an optional set code. Returns a string that represents a single cards data, a list of cards that match the search term or in the case where we search a partial term but only return one result, it returns a string such as 'Single match|Doom Blade|M10'. This is parsed above and reruns the method with the parameters 'Doom Blade' and 'M10'. This is janky af and I should change it.
+# if the user uses a number following the command operator, this means they want to retrieve the card at a certain index in a list of cards Ex. !12
+@router.number
+@asyncio.coroutine
+def numberCommand(message, number):
+	session = sessions.find(message)
+	if not session or len(session.cards) == 0:
+		yield from send(message.channel, 'No card list to search. Generate a list of cards first.')
+	elif number > 0: # list index starts at 0, card list starts at 1
+		cardName = yield from session.cards.get(number - 1) # fetches the page it's on if nobody has paged that far yet
+		sessions.resize(session)
+		if cardName:
+			toSend = yield from lookupCard(cardName, session)
+			for chunk in splitMessage(toSend):
+				yield from send(message.channel, chunk)
+
+# a user uses this if a list of cards exceeds 25 results. This is used to paginate lists of cards to keep spam down
+@router.command('cont')
+@asyncio.coroutine
+def contCommand(message, argument):
+	session = sessions.find(message)
+	if session and (session.shown < len(session.cards) or not session.cards.complete()):
+		toSend = yield from showPage(session)
+		for chunk in splitMessage(toSend):
+			yield from send(message.channel, chunk)
+
+# look up one card for a command and keep what it found in the session: the other side of a flip card, or the list a partial name matched
+@asyncio.coroutine
+def lookupCard(cardName, session, usersetcode=''):
+	toSend, flip, results = yield from findCardsByName(cardName, usersetcode)
+	session.flip = flip
+	if results is not None:
+		return (yield from listCards(results, session))
+	return toSend
+
+# takes a mandatory search parameter and an optional set code. Returns (a string that represents a single cards data or None, the card on its reverse side or '', the Results of cards that match the search term or None). If a partial term only matches one card we look that card up straight away and return its data. Nothing here touches the session, so several lookups can run at once
+@asyncio.coroutine
 def findCardsByName(cardName, usersetcode=''):
-	# Grab the Gatherer data using the user input card name
-	cards = Card.where(name='"%s"' % cardName).all()			
+	# Grab the card data using the user input card name, from the local store if we have one. mtgsdk blocks, so it runs on the fetcher's thread pool
+	if cardDB:
+		with metrics.span('stage_seconds', stage='carddb'):
+			cards = cardDB.printings(cardName)
+	else:
+		with metrics.span('stage_seconds', stage='mtgsdk_card'):
+			records = yield from flights.do(('card', cardName.lower()), lambda: loadCards(cardName)) # everyone asking for the same card right now shares one API call
+		cards = [Card(record) for record in records]
 	
-	global tempCardFlip # we need to use the global keyword to allow changes to the global variable to take place inside this function. Python does not necessarily use pass by value or reference. All variables are technically just pointers to values. Specifying the global keyword keeps the pointer consistent so that we can make appropriate value changes without changing where the pointer is pointing to. (I think)
-	tempCardFlip = ''
+	flip = ''
 	
 	# if the card was found, grab price and image data
 	if len(cards) > 0:
 		
 		index=-1 # this is weird. Python treats lists as cyclical. By default we will set the list index to -1. This will get us the last value in the list, even if the list only has one thing in it. This way we are by default always retrieving the newest print of a card.
 		
-		if usersetcode: # if the user specifies a set code, they want to see an older printing of a card. We iterate through each card in the results, find the index of the set code the user wants and set the list index to the same value
+		if usersetcode and cardDB: # the local store already knows where each printing sits in the list
+			printing = cardDB.printing(cardName, usersetcode)
+			if printing:
+				index = printing.printing
+		elif usersetcode: # if the user specifies a set code, they want to see an older printing of a card. We iterate through each card in the results, find the index of the set code the user wants and set the list index to the same value
 			for card in range(0,len(cards)):
 				if usersetcode == cards[card].set:
 					index = int(card)
@@ -152,38 +314,14 @@ def findCardsByName(cardName, usersetcode=''):
 			
 			for card in range(0,len(cards[index].names)): # This may or may not be broken
 				if cards[index].names[card] != cardName:
-					tempCardFlip = cards[index].names[card]
+					flip = cards[index].names[card]
 					break
 		
 		# MTG Goldfish data							
-		mtgoname = (cards[index].name).replace(' ', '+').replace('\'', '').replace(',', '').replace(':', '').replace('.', '') # remove special characters to ensure the link resolves
-		mtgoset = (cards[index].set_name).replace(' ', '+').replace('\'', '').replace(',', '').replace(':', '').replace('.', '')			
-		r = requests.get('https://www.mtggoldfish.com/price/%s/%s#online' % (mtgoset, mtgoname), timeout=10.000) # use the python requests library to retrieve and parse an html response
-		soup = BeautifulSoup(r.text, 'html.parser') # delicious beautiful soup, an extremely useful and strong text parser				
-		onlinepricelist = soup.findAll('div', class_="price-box online") # parse the html for all elements of tag div with specified class attribute
-		paperpricelist = soup.findAll('div', class_="price-box paper")			
-		onlineprice = 'None' # not all cards have both an online and physical price. Some are online only, some are physical only. Set None as default and modify if we find a price
-		paperprice = 'None'
-		
-		if (len(onlinepricelist) > 0):			
-			onlineprice = onlinepricelist[0].find('div', class_="price-box-price").contents[0]
-			
-		if (len(paperpricelist) > 0):
-			paperprice = paperpricelist[0].find('div', class_="price-box-price").contents[0]
-			
-		# same MTG Goldfish workflow, but for foil prices
-		r = requests.get('https://www.mtggoldfish.com/price/%s:Foil/%s#online' % (mtgoset, mtgoname), timeout=10.000)
-		soup = BeautifulSoup(r.text, 'html.parser')				
-		foilonlinepricelist = soup.findAll('div', class_="price-box online")
-		foilpaperpricelist = soup.findAll('div', class_="price-box paper")			
-		foilonlineprice = 'None'
-		foilpaperprice = 'None'
-		
-		if (len(foilonlinepricelist) > 0):			
-			foilonlineprice = foilonlinepricelist[0].find('div', class_="price-box-price").contents[0]			
-			
-		if (len(foilpaperpricelist) > 0):
-			foilpaperprice = foilpaperpricelist[0].find('div', class_="price-box-price").contents[0]
+		mtgoset, mtgoname = priceKey(cards[index])
+		warmer.record((mtgoset, mtgoname)) # !N lookups land here too, so everything people ask for counts towards what's popular
+		# regular and foil prices are fetched at the same time, and both come from the price cache when someone looked the card up recently
+		(onlineprice, paperprice), (foilonlineprice, foilpaperprice) = yield from asyncio.gather(getPrices(mtgoset, mtgoname, False), getPrices(mtgoset, mtgoname, True))
 		
 		# set the image url to the card at the set code index, or most recent if none specified NOTE: this may not always return an image in the case of a missing multiverseid
 		imageurl = cards[index].image_url				
@@ -192,236 +330,264 @@ def findCardsByName(cardName, usersetcode=''):
 		setMessage = ''				
 			
 		if len(cards) > 1 and cards[index].rarity != 'Basic Land': # lands are in all sets. If we look for all the sets lands are in the bot commits suicide
-			setMessage = '\r\nThis card appears in the following sets: '
-			for card in range(0,len(cards)):
-				setMessage = setMessage + cards[card].set_name + '(' + cards[card].set +'), '
+			setMessage = '\r\nThis card appears in the following sets: ' + ', '.join('%s(%s)' % (card.set_name, card.set) for card in cards)
 				
-		return '<http://gatherer.wizards.com/Pages/Card/Details.aspx?multiverseid=%s>\r\n<https://www.mtggoldfish.com/price/%s/%s#online>\r\n%s\r\nReg: MTGO: %s || Paper: %s\r\nFoil: MTGO: %s || Paper: %s%s%s' % (cards[0].multiverse_id, mtgoset, mtgoname, imageurl, onlineprice, paperprice, foilonlineprice, foilpaperprice, setMessage, cardFlipMessage)
+		return ('<http://gatherer.wizards.com/Pages/Card/Details.aspx?multiverseid=%s>\r\n<https://www.mtggoldfish.com/price/%s/%s#online>\r\n%s\r\nReg: MTGO: %s || Paper: %s\r\nFoil: MTGO: %s || Paper: %s%s%s' % (cards[0].multiverse_id, mtgoset, mtgoname, imageurl, onlineprice, paperprice, foilonlineprice, foilpaperprice, setMessage, cardFlipMessage), flip, None)
+	
+	# we did not find one specific card, so search every card name we know for the term. The local index has no result limit and handles typos
+	elif nameIndex:
+		with metrics.span('stage_seconds', stage='nameindex'):
+			matches = nameIndex.search(cardName)
+		if len(matches) == 1: # only one card matches, show it rather than a list of one
+			return (yield from findCardsByName(matches[0], usersetcode))
+		elif len(matches) > 0:
+			return (None, '', Results(matches))
+		else:
+			return ('Search yielded no results.', '', None)
 	
-	# we did not find one specific card, so we are going to search for all cards that match the search term, if any
+	# no local card store, so we are going to ask Gatherer for all cards that match the search term, if any
 	else:
-		r = requests.get('http://gatherer.wizards.com/Pages/Search/Default.aspx?name=+%%5B%s%%5D' % cardName, timeout=10.000) # search gatherer with the search term. NOTE: gatherer only returns 100 cards per page. If we match on more than 100 cards, the remaining cards are displayed in a new response. We currently don't handle this, but maybe we can in the future
-		soup = BeautifulSoup(r.text, 'html.parser') # yum soup		
-		cardsearch = soup.findAll('span', class_="cardTitle")																
+		cardsearch, singlecard, total = yield from gathererPage(cardName, 0) # card names from the first search page, or the card name if Gatherer took us straight to a card page
 		
-		# did we find some?
+		# did we find some? Gatherer only returns 100 cards per page, the rest are fetched as people page through them
 		if len(cardsearch) > 0:	
-			
-			global tempCardList
-			tempCardList = []
-			
-			for card in range(0,len(cardsearch)):
-				tempCardList.append(cardsearch[card].find('a').contents[0])
-														
-			searchmessage = 'Your search found ' + str(len(tempCardList)) + ' cards: '
-			
-			count = 0 # show only 25 cards at a time and force the user to use !cont to retrieve the next paginated list of results							
-			for card in range(0,len(tempCardList)):
-				count = count + 1
-				if count > 25:	
-					global itemsShown
-					itemsShown = 25
-					searchmessage = searchmessage + '.\r\n\r\nType !cont to receive the next 25.'						
-					break
-				else:						
-					searchmessage = searchmessage + tempCardList[card] + '(' + str(card+1) + '), '							
-				
-			return searchmessage			
+			return (None, '', Results(cardsearch, total, GATHERER_PAGE_SIZE, lambda page, priority: gathererNames(cardName, page, priority)))
 			
 		# this gets hit in the case that we either find no cards at all or we find one card and we are immediately taken to the card page rather than the search page
-		else:
-			multisearch = soup.findAll('span', {'id':'ctl00_ctl00_ctl00_MainContent_SubContent_SubContentHeader_subtitleDisplay'}) # this is gross, but necessary		
-			if (len(multisearch) > 0):		
-				return 'Single match found|%s|%s' % (multisearch[0].contents[0], usersetcode) # return our dreaded internal only string for parsing and rerun the function
-			else:					
-				return 'Search yielded no results.'	
-
-# use the mtgsdk built in generate_booster function. This only kinda works because mtgsdk might be broken
-def openBooster(setName):
-	cards = Set.generate_booster(setName)	
+		elif singlecard:
+			return (yield from findCardsByName(singlecard, usersetcode)) # Gatherer jumped straight to the card page, look that card up by its full name
+		else:					
+			return ('Search yielded no results.', '', None)	
+
+# the printings of a card as API style records, from the disk cache if we looked it up before and the API if not
+@asyncio.coroutine
+def loadCards(cardName):
+	entry = yield from diskCache.lookup('card', cardName.lower())
+	if entry is not None:
+		return entry[0]
+	cards = yield from fetcher.runBlocking(Card.where(name='"%s"' % cardName).all)
+	records = [{field: getattr(card, attribute) for field, attribute in CARD_RECORD} for card in cards]
+	diskCache.put('card', cardName.lower(), records, None if records else diskCache.ttls['search']) # a name with no cards may be a partial name, or a card that's only just been printed, so don't hold on to that as long
+	return records
+
+# one page of a Gatherer name search as (names, single card name or None, total or None), from the disk cache if someone searched for it recently. Pages count from 0 like Gatherer's own page parameter
+@asyncio.coroutine
+def gathererPage(cardName, page, priority=INTERACTIVE):
+	key = (cardName.lower(), page)
+	return tuple((yield from flights.do(flightKey('gatherer', key, priority), lambda: diskCache.get('gatherer', key, lambda: fetchGatherer(cardName, page, priority)))))
+
+@asyncio.coroutine
+def fetchGatherer(cardName, page, priority=INTERACTIVE):
+	with metrics.span('stage_seconds', stage='gatherer'):
+		r = yield from fetcher.fetchText(GATHERER_URL + '/Pages/Search/Default.aspx?name=+%%5B%s%%5D' % cardName + ('&page=%s' % page if page else ''), priority)
+	with metrics.span('stage_seconds', stage='parse_gatherer'):
+		return extractSearch(r)
+
+# the Results loader for Gatherer searches
+@asyncio.coroutine
+def gathererNames(cardName, page, priority=INTERACTIVE):
+	cardsearch, singlecard, total = yield from gathererPage(cardName, page, priority)
+	return (cardsearch, total)
+
+# the single flight key for a lookup. Background fetches get flights of their own, because whoever starts a flight sets its priority and someone asking for the same thing meanwhile shouldn't be stuck behind it in the BULK queue. They make their own INTERACTIVE request instead
+def flightKey(kind, key, priority=INTERACTIVE):
+	return (kind if priority == INTERACTIVE else kind + '_bulk',) + key
+
+# returns the (MTGO, paper) prices for a card, from the cache if we have them and MTG Goldfish if not
+@asyncio.coroutine
+def getPrices(mtgoset, mtgoname, foil):
+	key = (mtgoset, mtgoname, foil)
+	return (yield from priceCache.get(key, lambda: flights.do(('price',) + key, lambda: fetchPrices(mtgoset, mtgoname, foil)))) # cache misses for the same price at the same time share one page fetch
+
+# (set, name) as they appear in an MTG Goldfish url, which is also how prices are keyed in the caches
+def priceKey(card):
+	mtgoname = (card.name).replace(' ', '+').replace('\'', '').replace(',', '').replace(':', '').replace('.', '') # remove special characters to ensure the link resolves
+	mtgoset = (card.set_name).replace(' ', '+').replace('\'', '').replace(',', '').replace(':', '').replace('.', '')
+	return (mtgoset, mtgoname)
+
+# fetch a price again for the warmer, behind anyone waiting on a reply, and cache it. It's a flight of its own, so someone asking for the card meanwhile gets an interactive fetch instead of waiting on this one
+@asyncio.coroutine
+def refreshPrices(key):
+	mtgoset, mtgoname, foil = key
+	priceCache.save(key, (yield from flights.do(flightKey('price', key, BULK), lambda: fetchPrices(mtgoset, mtgoname, foil, BULK))))
+
+# True while lookups are queued up for MTG Goldfish, the warmer sits those rounds out
+def pricesBusy():
+	queue = fetcher.scheduler.stats().get(urlsplit(GOLDFISH_URL).hostname)
+	return queue is not None and queue['waiting'] > 0
+
+# the price keys of every card in a set released in the last days days, newest set first. Only known with a card store
+def newSetCards(days):
+	if not cardDB:
+		return []
+	cutoff = (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+	keys = collections.OrderedDict()
+	for cardset in sorted(cardDB.sets.values(), key=lambda s: s.get('releaseDate', ''), reverse=True):
+		if cardset.get('releaseDate', '') < cutoff:
+			break
+		for data in cardset['cards']:
+			card = cardDB.printing(data['name'], cardset['code'])
+			if card is not None:
+				keys[priceKey(card)] = None
+	return list(keys)
+
+# scrape one MTG Goldfish price page. Foil prices live on the same page under the set name with :Foil on the end
+@asyncio.coroutine
+def fetchPrices(mtgoset, mtgoname, foil, priority=INTERACTIVE):
+	with metrics.span('stage_seconds', stage='goldfish'):
+		r = yield from fetcher.fetchText(GOLDFISH_URL + '/price/%s%s/%s#online' % (mtgoset, ':Foil' if foil else '', mtgoname), priority) # retrieve the html over the shared connection pool and parse the response
+	with metrics.span('stage_seconds', stage='parse_goldfish'):
+		return extractPrices(r) # only parses as far as the two price boxes, not the whole page
+
+# open count packs of a set. With the card store loaded (and numpy) the packs come from our own booster generator, all in one pass, otherwise we fall back to the mtgsdk built in generate_booster function which only kinda works because mtgsdk might be broken
+@asyncio.coroutine
+def openBooster(setName, session, count=1):
+	if boosters is not None and setName in boosters:
+		with metrics.span('stage_seconds', stage='booster_local'):
+			packs = boosters.open(setName, count)
+	elif count > 1:
+		return 'I can only open one pack at a time for that set.'
+	else:
+		with metrics.span('stage_seconds', stage='mtgsdk_booster'):
+			cards = yield from fetcher.runBlocking(Set.generate_booster, setName) # not through single flight, every pack is its own random draw and two people opening one at the same moment shouldn't get the same cards
+		packs = [[(card.name, card.rarity, random.randint(0,90) == 1) for card in cards]] if len(cards) > 0 else []
 			
-	if(len(cards) > 0):
+	if(len(packs) > 0):
 		
-		global tempCardList
-		tempCardList = []
+		sessions.setCards(session, Results([name for pack in packs for (name, rarity, foil) in pack])) # so !N works on the cards in the packs, numbered straight through
+		session.shown = len(session.cards) # the reply below lists every card, there's nothing left for !cont
 		
-		print(str(len(cards)))
+		number = 0
+		packMessages = []
+		for pack in packs:
+			cardMessages = []
+			for (name, rarity, foil) in pack:
+				number = number + 1
+				cardMessages.append('%s(%s%s)(%s)' % (name, 'Foil ' if foil else '', rarity, number))
+			packMessages.append(', '.join(cardMessages))
 		
-		boosterMessage = 'You opened: '
-		
-		for card in range(0,len(cards)):
-			tempCardList.append(cards[card].name)
-			if random.randint(0,90) == 1:
-				boosterMessage = boosterMessage + '%s(Foil %s)(%s), ' % (cards[card].name, cards[card].rarity, card + 1)
-			else:
-				boosterMessage = boosterMessage + '%s(%s)(%s), ' % (cards[card].name, cards[card].rarity, card + 1)
-			
-		return boosterMessage		
+		if len(packMessages) == 1:
+			return 'You opened: ' + packMessages[0]
+		return 'You opened %s packs:\r\n' % len(packMessages) + '\r\n'.join('Pack %s: %s' % (pack + 1, packMessages[pack]) for pack in range(len(packMessages)))
 		
 	else:
 		return 'Incorrect set code.'
 
-# here we go
-def advancedSearch(query):
-	# a huge ass list of card potential card properties, some can be lists
-	# , represents AND, | represents OR in a list
-	
-	layoutp = ''            # one or list of: normal, split, flip, double-faced, token, plane, scheme, phenomenon, leveler, vanguard
-	cmcp = '-1'             # one but may use operators (gt, gte, lt, lte)
-	colorsp = ''            # one or list of: red, blue, white, black, green, (colorless?)
-	colorIdentityp = ''     # one or list of: R,U,W,B,G,(C?)
-	typep = ''              # one or list... too mant to list here
-	supertypesp = ''        # one or list... too many to list here
-	typesp = ''             # one or list
-	subtypesp = ''          # one or list
-	rarityp = ''            # one or list of: common, uncommon, rare, (mythic?), special, (land?)
-	setp = ''		        # one or list (this is set code, not full name)
-	setNamep = ''           # one or list (full name)
-	textp = ''              # one or list !!!
-	flavorp = ''            # one or list !!!
-	artistp = ''            # one or list
-	# numberp = ''          # one or list (this is a tiny ass number in the card bottom center)
-	powerp = ''             # one but may use operators (gt, lt, gte, lte)
-	toughnessp = ''         # one but may use operators
-	loyaltyp = ''           # one but may use operators
-	# foreignNamep = ''     # one
-	# languagep = ''        # one
-	gameFormatp = ''        # one
-	legalityp = ''          # one
-	orderbyp = ''           # one
-	# containsp = ''        # one or list of card properties (like image_url)
-		
-	global tempCardList
-	tempCardList = []
-	
-	cards = ['']
-	
+# here we go. Search the local card table if we have one, otherwise hand the query to the API
+@asyncio.coroutine
+def advancedSearch(query, session):
+	# the query compiler reads properties split by ; and lists where , represents AND, | represents OR
+	if cardTable is not None:
+		with metrics.span('stage_seconds', stage='search_local'):
+			names = cardTable.search(query)
+		if len(names) > 0:
+			return (yield from listCards(Results(names), session))
+		return 'Search yielded no results.'
 	
-	properties = query.split(';')
+	params = cardsearch.parseQuery(query) # matches whole property names, so type= no longer picks up supertypes= or subtypes=
+	params.setdefault('cmc', 'gte0')
 	
-	# in the future I can likely use a Dictionary of keys and values instead of this gross thing
-	for prop in properties:
-		if 'layout=' in prop:
-			layoutp = prop.split('=')[1]				
-		elif 'cmc=' in prop:
-			cmcp = prop.split('=')[1]
-		elif 'colors=' in prop:
-			colorsp = prop.split('=')[1]
-		elif 'colorIdentity=' in prop:
-			colorIdentityp = prop.split('=')[1]
-		elif 'type=' in prop:
-			typep = prop.split('=')[1]
-		elif 'supertypes=' in prop:
-			supertypesp = prop.split('=')[1]
-		elif 'types=' in prop:
-			typesp = prop.split('=')[1]
-		elif 'subtypes=' in prop:
-			subtypesp = prop.split('=')[1]
-		elif 'rarity=' in prop:
-			rarityp = prop.split('=')[1]
-		elif 'set=' in prop:
-			setp = prop.split('=')[1]
-		elif 'setName=' in prop:
-			setNamep = prop.split('=')[1]
-		elif 'text=' in prop:
-			textp = prop.split('=')[1]
-		elif 'flavor=' in prop:
-			flavorp = prop.split('=')[1]
-		elif 'artist=' in prop:
-			artistp = prop.split('=')[1]
-		# elif 'number=' in prop:
-			# numberp = prop.split('=')[1]
-		elif 'power=' in prop:
-			powerp = prop.split('=')[1]
-		elif 'toughness=' in prop:
-			toughnessp = prop.split('=')[1]
-		elif 'loyalty=' in prop:
-			loyaltyp = prop.split('=')[1]
-		# elif 'foreignName=' in prop:
-			# foreignNamep = prop.split('=')[1]
-		# elif 'language=' in prop:
-			# languagep = prop.split('=')[1]
-		elif 'gameFormat=' in prop:
-			gameFormatp = prop.split('=')[1]
-		elif 'legality=' in prop:
-			legalityp = prop.split('=')[1]
-		elif 'orderby=' in prop:
-			orderbyp = prop.split('=')[1]
-		# elif 'contains=' in prop:
-			# containsp = prop.split('=')[1]
-		
-	# do the search!
-	cards = Card.where(layout=layoutp) \
-				.where(cmc=(cmcp if cmcp != '-1' else 'gte0')) \
-				.where(colors=colorsp) \
-				.where(colorIdentity=colorIdentityp) \
-				.where(type=typep) \
-				.where(supertypes=supertypesp) \
-				.where(types=typesp) \
-				.where(subtypes=subtypesp) \
-				.where(rarity=rarityp) \
-				.where(set=setp) \
-				.where(setName=setNamep) \
-				.where(text=textp) \
-				.where(flavor=flavorp) \
-				.where(artist=artistp) \
-				.where(power=powerp) \
-				.where(toughness=toughnessp) \
-				.where(loyalty=loyaltyp) \
-				.where(gameFormat=gameFormatp) \
-				.where(legality=legalityp) \
-				.where(orderBy=orderbyp) \
-				.all()					
-
-				# .where(number=numberp) \
-				# .where(foreignName=foreignNamep) \
-				# .where(language=languagep) \
-				# .where(contains=containsp) \
+	# do the search! Only the first page of results is fetched now, the rest come in as people !cont through them or jump ahead with !N
+	key = tuple(sorted(params.items()))
+	loader = lambda page, priority: flights.do(flightKey('search', (key, page), priority), lambda: diskCache.get('search', (key, page), lambda: searchPage(key, page, priority))) # the same page of the same query running twice at once only goes to the API once, and not at all if it's on disk
+	names, total = yield from loader(0, INTERACTIVE)
 	
-	if(len(cards) > 0):					
-		
-		for card in range(0,len(cards)):
-			tempCardList.append(cards[card].name)
-		
-		cardMessage = 'Your search found ' + str(len(tempCardList)) + ' cards: '
-		count = 0
-		
-		for card in range(0,len(tempCardList)):			
-			count = count + 1
-			if count > 25:
-				global itemsShown
-				itemsShown = 25				
-				cardMessage = cardMessage + '.\r\n\r\nType !cont to receive the next 25.'								
-				break
-			else:				
-				cardMessage = cardMessage + tempCardList[card] + '(' + str(card+1) + '), '
-		
-		return cardMessage
+	if(len(names) > 0):					
+		return (yield from listCards(Results(names, total, SEARCH_PAGE_SIZE, loader), session))
 	else:
 		return 'Search yielded no results.'
+
+# one page of card API search results as (names, total or None), straight from the API rather than through mtgsdk so we get its Total-Count header and don't pull every page at once. Pages count from 0 here and from 1 in the API
+@asyncio.coroutine
+def searchPage(params, page, priority=INTERACTIVE):
+	url = '%s/%s?%s' % (mtgsdk.querybuilder.__endpoint__, Card.RESOURCE, urlencode(list(params) + [('page', page + 1), ('pageSize', SEARCH_PAGE_SIZE)]))
+	with metrics.span('stage_seconds', stage='mtgsdk_search'):
+		text, headers = yield from fetcher.fetch(url, priority)
+	total = headers.get('Total-Count', '')
+	return ([card['name'] for card in json.loads(text)['cards']], int(total) if total.isdigit() else None)
 		
+# break a long reply into pieces Discord will accept, on line breaks where we can and between cards where we can't
+def splitMessage(text, limit=2000):
+	chunks = []
+	current = ''
+	for line in text.split('\r\n'):
+		while len(line) > limit:
+			cut = line.rfind(', ', 0, limit)
+			cut = cut if cut > 0 else limit
+			if current:
+				chunks.append(current)
+				current = ''
+			chunks.append(line[:cut])
+			line = line[cut:].lstrip(', ')
+		if current and len(current) + 2 + len(line) > limit:
+			chunks.append(current)
+			current = line
+		else:
+			current = current + '\r\n' + line if current else line
+	if current:
+		chunks.append(current)
+	return chunks
 
-def nextPage():
-	cardMessage = 'Your search found ' + str(len(tempCardList)) + ' cards: '
+# set up a fresh list of cards to page through and return the first page of it
+@asyncio.coroutine
+def listCards(results, session):
+	sessions.setCards(session, results) # the session keeps the list itself, we don't copy it
+	return (yield from showPage(session))
+
+# list the next PAGE_SIZE cards of the session's list, fetching them if they're on a page we haven't got yet. The message is built in one join rather than a string at a time
+@asyncio.coroutine
+def showPage(session):
+	start = session.shown
+	names = yield from session.cards.names(start, start + PAGE_SIZE)
+	session.shown = start + len(names)
+	sessions.resize(session)
+	if not names:
+		return 'No more cards to show.'
 	
-	global itemsShown	
-	count = 0
-		
-	for card in range(itemsShown,len(tempCardList)):		
-		count = count + 1
-		if count > 25:			
-			cardMessage = cardMessage + '.\r\n\r\nType !cont to receive the next 25.'
-			itemsShown = itemsShown + 25 # increase the results we've shown so we can keep track of what page we are on
-			break
-		else:				
-			cardMessage = cardMessage + tempCardList[card] + '(' + str(card+1) + '), '					
+	more = session.shown < len(session.cards) or not session.cards.complete()
+	if more and prefetchPages: # so the next !cont doesn't have to wait on the site
+		session.cards.prefetch(session.shown + PAGE_SIZE - 1)
 	
+	found = str(len(session.cards)) if session.cards.complete() else '%s+' % len(session.cards)
+	cardMessage = 'Your search found %s cards: %s' % (found, ', '.join('%s(%s)' % (name, start + number + 1) for number, name in enumerate(names)))
+	if more:
+		cardMessage = cardMessage + '.\r\n\r\nType !cont to receive the next %s.' % PAGE_SIZE
 	return cardMessage
 	
-config = SafeConfigParser()
-config.read('config.ini') # meant to be in the same directory as mtg.py
-# options = config.options('Discord') # find all options in the Discord section of the config.ini
-secrettoken = config.get('Discord', 'SecretToken')
+# apply the optional config.ini sections and load the card store. The benchmarks call this too, with their own config
+def setup(config):
+	global nameIndex, cardTable, boosters, maxPacks, metricsHost, metricsPort, admins, prefetchPages
+	fetcher.configure(config) # optional [Network] section to tune connection limits
+	priceCache.configure(config) # optional [Cache] section to tune the price cache
+	diskCache.configure(config) # and to put the disk cache behind it
+	priceCache.disk = diskCache
+	warmer.configure(config) # optional [Warmer] section for background price refreshes
+	sessions.configure(config) # optional [Sessions] section to bound per channel state
+	if cardDB.load(config.get('CardDB', 'Path', fallback='cards.json')): # optional, build it with 'python3 carddb.py import AllSets.json'
+		nameIndex = NameIndex(cardDB.cardNames())
+		if cardsearch.numpy is not None:
+			cardTable = cardsearch.CardTable(cardDB)
+		if booster.numpy is not None:
+			boosters = booster.BoosterGenerator(cardDB, config.getint('Booster', 'Seed', fallback=None)) # a fixed seed gives the same packs every run, handy for testing
+	maxPacks = config.getint('Booster', 'MaxPacks', fallback=maxPacks)
+	prefetchPages = config.getboolean('Search', 'Prefetch', fallback=prefetchPages)
+	metricsHost = config.get('Metrics', 'Host', fallback=metricsHost)
+	metricsPort = config.getint('Metrics', 'Port', fallback=metricsPort)
+	admins = set(admin.strip() for admin in config.get('Metrics', 'Admins', fallback='').split(',') if admin.strip())
+	metrics.gauge('price_cache', priceCache.stats)
+	metrics.gauge('disk_cache', diskCache.stats)
+	metrics.gauge('warmer', warmer.stats)
+	metrics.gauge('singleflight', flights.stats)
+	metrics.gauge('sessions', sessions.stats)
+	metrics.gauge('scheduler', fetcher.scheduler.stats)
 
-# now that we've defined the connection info and the methods the bot will use... connect and live! Secret token is used here that Discord generates. When commiting to source control - REMOVE THIS TOKEN, IT'S A SECRET		
-client.run(secrettoken)
\ No newline at end of file
+if __name__ == '__main__':
+	config = SafeConfigParser()
+	config.read('config.ini') # meant to be in the same directory as mtg.py
+	setup(config)
+	# options = config.options('Discord') # find all options in the Discord section of the config.ini
+	secrettoken = config.get('Discord', 'SecretToken')
+	
+	# now that we've defined the connection info and the methods the bot will use... connect and live! Secret token is used here that Discord generates. When commiting to source control - REMOVE THIS TOKEN, IT'S A SECRET		
+	client.run(secrettoken)
+	diskCache.close() # write out anything still waiting
@@ -0,0 +1,93 @@
+import asyncio                            # everything in here runs on the bot's event loop
+import concurrent.futures                 # bounded thread pool for the blocking mtgsdk calls
+import functools                          # bind arguments for run_in_executor
+import inspect                            # aiohttp versions disagree on whether close() is a coroutine
+from urllib.parse import urlsplit         # pull the host out of a url so we can limit per host
+import aiohttp                            # comes along with discord.py, non-blocking http
+from scheduler import Scheduler, Overloaded, INTERACTIVE # per host rate limits, priorities and backoff
+
+# default connection limits, these can be overridden in the [Network] section of config.ini
+MAX_CONNECTIONS = 20 # total open connections shared by every host
+MAX_PER_HOST = 4     # connections to any single host (mtggoldfish, gatherer) at the same time
+SDK_WORKERS = 8      # threads available to run mtgsdk calls, which use requests under the hood and block
+TIMEOUT = 10.0       # seconds before we give up on a page, same as the old requests.get timeout
+RETRIES = 2          # extra tries for a page that came back 429 or 5xx, after the host's backoff
+SDK_HOST = 'api.magicthegathering.io' # mtgsdk makes its own requests, we schedule them under this host
+
+# one of these is shared by the whole bot. It owns the http session (keep-alive connection pool) and the thread pool so that card lookups never block the Discord gateway
+class Fetcher:
+
+	def __init__(self, maxConnections=MAX_CONNECTIONS, maxPerHost=MAX_PER_HOST, sdkWorkers=SDK_WORKERS, timeout=TIMEOUT):
+		self.maxConnections = maxConnections
+		self.maxPerHost = maxPerHost
+		self.timeout = timeout
+		self.session = None   # created lazily, aiohttp wants a running loop before we make one
+		self.retries = RETRIES
+		self.scheduler = Scheduler(concurrency=maxPerHost) # one slow or throttling site can't eat the whole pool
+		self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=sdkWorkers)
+
+	# read the optional [Network] section of the config file, anything missing keeps its default
+	def configure(self, config):
+		self.scheduler.configure(config)
+		if not config.has_section('Network'):
+			return
+		self.maxConnections = config.getint('Network', 'MaxConnections', fallback=self.maxConnections)
+		self.maxPerHost = config.getint('Network', 'MaxPerHost', fallback=self.maxPerHost)
+		self.scheduler.concurrency = self.maxPerHost
+		self.retries = config.getint('Network', 'Retries', fallback=self.retries)
+		self.timeout = config.getfloat('Network', 'Timeout', fallback=self.timeout)
+		sdkWorkers = config.getint('Network', 'SdkWorkers', fallback=self.executor._max_workers)
+		if sdkWorkers != self.executor._max_workers:
+			self.executor.shutdown(wait=False)
+			self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=sdkWorkers)
+
+	def getSession(self):
+		if self.session is None or self.session.closed:
+			connector = aiohttp.TCPConnector(limit=self.maxConnections)
+			self.session = aiohttp.ClientSession(connector=connector)
+		return self.session
+
+	# grab a page and hand back its body as text. Raises asyncio.TimeoutError if the site takes longer than the timeout, and Overloaded if the site is too busy or kept answering 429/5xx
+	@asyncio.coroutine
+	def fetchText(self, url, priority=INTERACTIVE):
+		text, headers = yield from self.fetch(url, priority)
+		return text
+
+	# the same as fetchText but hands back (text, headers), for when the answer needs a header too like the card API's Total-Count
+	@asyncio.coroutine
+	def fetch(self, url, priority=INTERACTIVE):
+		host = urlsplit(url).hostname
+		for attempt in range(self.retries + 1):
+			yield from self.scheduler.acquire(host, priority) # waits out any backoff from the last try
+			status = None
+			retryAfter = None
+			try:
+				response = yield from asyncio.wait_for(self.getSession().get(url), self.timeout)
+				try:
+					status = response.status
+					if status != 429 and status < 500:
+						return ((yield from asyncio.wait_for(response.text(), self.timeout)), response.headers)
+					retryAfter = response.headers.get('Retry-After')
+				finally:
+					response.release() # hand the connection back to the pool for the next lookup
+			finally:
+				self.scheduler.release(host, status, retryAfter)
+		raise Overloaded('%s answered %s' % (host, status))
+
+	# run a blocking function (mtgsdk) on the thread pool and wait for it without blocking the loop. It takes a turn with the scheduler like any other request to the card API
+	@asyncio.coroutine
+	def runBlocking(self, func, *args, priority=INTERACTIVE, **kwargs):
+		loop = asyncio.get_event_loop()
+		yield from self.scheduler.acquire(SDK_HOST, priority)
+		try:
+			return (yield from loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs)))
+		finally:
+			self.scheduler.release(SDK_HOST)
+
+	@asyncio.coroutine
+	def close(self):
+		if self.session is not None and not self.session.closed:
+			closing = self.session.close() # a plain call on older aiohttp, a coroutine on newer ones
+			if inspect.isawaitable(closing):
+				yield from closing
+		self.executor.shutdown(wait=False)
@@ -0,0 +1,84 @@
+import collections                        # counting shared trigrams when we fall back to fuzzy matching
+
+# how alike two names have to be (shared trigrams over all trigrams) before a typo match is worth showing
+FUZZY_THRESHOLD = 0.3
+
+# break a name into overlapping three letter chunks. Padding with spaces lets short words and word starts count too
+def trigrams(text):
+	padded = '  %s ' % text
+	return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# in memory index over every card name. Answers partial name searches (what Gatherer's name=[term] search did) and tolerates typos, without a trip to Gatherer and without its 100 result limit
+class NameIndex:
+
+	def __init__(self, names=()):
+		self.names = []    # display names, position is the id used in the posting lists
+		self.lowered = []  # lowercased copy so we don't lower every name on every search
+		self.grams = {}    # trigram -> list of name ids containing it
+		self.gramCounts = [] # number of distinct trigrams in each name, used to score fuzzy matches
+		for name in names:
+			self.add(name)
+
+	def __len__(self):
+		return len(self.names)
+
+	def add(self, name):
+		nameid = len(self.names)
+		lowered = name.lower()
+		self.names.append(name)
+		self.lowered.append(lowered)
+		grams = trigrams(lowered)
+		self.gramCounts.append(len(grams))
+		for gram in grams:
+			self.grams.setdefault(gram, []).append(nameid)
+
+	# every name containing the search term, best matches first. If nothing contains it we assume a typo and rank names by how many trigrams they share with the term
+	def search(self, term, limit=None):
+		term = term.lower().strip()
+		if not term:
+			return []
+		ranked = self.substring(term)
+		if not ranked:
+			ranked = self.fuzzy(term)
+		if limit:
+			ranked = ranked[:limit]
+		return [self.names[nameid] for nameid in ranked]
+
+	def substring(self, term):
+		if len(term) < 3: # too short to have a trigram of its own, a straight scan is still quick
+			candidates = range(len(self.names))
+		else:
+			postings = []
+			for i in range(len(term) - 2):
+				gram = term[i:i + 3]
+				if gram not in self.grams:
+					return []
+				postings.append(self.grams[gram])
+			postings.sort(key=len) # intersect starting from the rarest trigram to keep the candidate set small
+			candidates = set(postings[0])
+			for posting in postings[1:]:
+				candidates.intersection_update(posting)
+				if not candidates:
+					return []
+		matches = []
+		for nameid in candidates:
+			position = self.lowered[nameid].find(term)
+			if position < 0:
+				continue
+			wordstart = position == 0 or self.lowered[nameid][position - 1] in ' -,'
+			matches.append((position != 0, not wordstart, len(self.names[nameid]), self.lowered[nameid], nameid)) # names that start with the term, then words that start with it, then shortest
+		matches.sort()
+		return [match[-1] for match in matches]
+
+	def fuzzy(self, term):
+		termgrams = trigrams(term)
+		shared = collections.Counter()
+		for gram in termgrams:
+			shared.update(self.grams.get(gram, ()))
+		scored = []
+		for nameid, count in shared.items():
+			score = count / (len(termgrams) + self.gramCounts[nameid] - count)
+			if score >= FUZZY_THRESHOLD:
+				scored.append((-score, len(self.names[nameid]), self.lowered[nameid], nameid))
+		scored.sort()
+		return [score[-1] for score in scored]
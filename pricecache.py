@@ -0,0 +1,106 @@
+import asyncio                            # refreshes of stale prices run in the background on the bot's loop
+import collections                        # OrderedDict doubles as our LRU list
+import logging                            # background refresh failures are logged, not raised
+import time                               # monotonic clock for expiry
+
+# defaults, overridable in the [Cache] section of config.ini
+MAX_ENTRIES = 2000 # (set, name, foil) keys held before the least recently used is dropped
+TTL = 3600         # seconds a price is considered fresh
+STALE = 0          # extra seconds an expired price may still be served while a fresh one is fetched in the background, 0 turns this off
+
+# bounded cache of MTGGoldfish prices keyed on (set, name, foil). Fresh entries are served straight away, expired ones are either refetched or (with stale-while-revalidate) served while a refresh happens in the background. With a disk cache behind it, a miss checks the disk before going to MTGGoldfish
+class PriceCache:
+
+	def __init__(self, maxEntries=MAX_ENTRIES, ttl=TTL, stale=STALE, disk=None):
+		self.maxEntries = maxEntries
+		self.ttl = ttl
+		self.stale = stale
+		self.disk = disk  # a DiskCache, or None
+		self.entries = collections.OrderedDict() # key -> (value, expires), most recently used last
+		self.refreshing = set()                  # keys with a background refresh in flight so we only start one
+		self.hits = 0
+		self.misses = 0
+		self.staleHits = 0
+		self.evictions = 0
+
+	def configure(self, config):
+		if not config.has_section('Cache'):
+			return
+		self.maxEntries = config.getint('Cache', 'PriceSize', fallback=self.maxEntries)
+		self.ttl = config.getfloat('Cache', 'PriceTTL', fallback=self.ttl)
+		self.stale = config.getfloat('Cache', 'PriceStale', fallback=self.stale)
+
+	def __len__(self):
+		return len(self.entries)
+
+	# hand back the cached value for key, calling the loader coroutine to fetch it if we don't have a usable one
+	@asyncio.coroutine
+	def get(self, key, loader):
+		now = time.monotonic()
+		entry = self.entries.get(key)
+		if entry is not None:
+			value, expires = entry
+			if now < expires:
+				self.hits = self.hits + 1
+				self.entries.move_to_end(key)
+				return value
+			if now < expires + self.stale:
+				self.staleHits = self.staleHits + 1
+				self.entries.move_to_end(key)
+				if key not in self.refreshing:
+					self.refreshing.add(key)
+					asyncio.ensure_future(self.refresh(key, loader))
+				return value
+		self.misses = self.misses + 1
+		if self.disk is not None:
+			entry = yield from self.disk.lookup('price', key)
+			if entry is not None: # fetched before the last restart and still fresh, keep the time it has left
+				value, ttl = tuple(entry[0]), entry[1]
+				self.put(key, value, ttl)
+				return value
+		value = yield from loader()
+		self.save(key, value)
+		return value
+
+	def put(self, key, value, ttl=None):
+		self.entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+		self.entries.move_to_end(key)
+		while len(self.entries) > self.maxEntries:
+			self.entries.popitem(last=False)
+			self.evictions = self.evictions + 1
+
+	# seconds until key goes stale, None if it isn't cached
+	def expiresIn(self, key):
+		entry = self.entries.get(key)
+		if entry is None:
+			return None
+		return entry[1] - time.monotonic()
+
+	# seconds until key goes stale in the cache behind this one, None if it isn't there. When launcher.py runs us sharded that's the cache every worker shares, so a price another worker fetched is kept here too
+	@asyncio.coroutine
+	def expiresBehind(self, key):
+		if self.disk is None:
+			return None
+		entry = yield from self.disk.lookup('price', key)
+		if entry is None:
+			return None
+		self.put(key, tuple(entry[0]), entry[1])
+		return entry[1]
+
+	# a price fresh from MTGGoldfish, kept in memory and on disk
+	def save(self, key, value):
+		self.put(key, value)
+		if self.disk is not None:
+			self.disk.put('price', key, value, self.ttl)
+
+	@asyncio.coroutine
+	def refresh(self, key, loader):
+		try:
+			self.save(key, (yield from loader()))
+		except Exception:
+			logging.exception('Background price refresh failed for %s', key) # keep serving the stale price
+		finally:
+			self.refreshing.discard(key)
+
+	def stats(self):
+		return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'stale': self.staleHits, 'evictions': self.evictions}
@@ -0,0 +1,131 @@
+from html.parser import HTMLParser        # the standard library's incremental parser, we only act on the handful of tags we care about
+import re                                 # the result count at the end of Gatherer's search heading
+
+CHUNK_SIZE = 16384 # characters fed to the parser at a time, we check whether we're done between chunks
+
+# the span Gatherer fills with the card name when a search jumps straight to a single card's page
+SINGLE_CARD_ID = 'ctl00_ctl00_ctl00_MainContent_SubContent_SubContentHeader_subtitleDisplay'
+# the search heading on a Gatherer results page, which ends with the number of cards found. Ex. Search: +[blade] (57)
+SEARCH_TERM_ID = 'ctl00_ctl00_ctl00_MainContent_SubContent_SubContentHeader_searchTermDisplay'
+TOTAL_PATTERN = re.compile(r'\(([0-9]+)\)\s*$')
+
+# base for the extractors below. Feeds the page a chunk at a time and stops as soon as the extractor has everything it needs, so most of a big page is never parsed
+class Extractor(HTMLParser):
+
+	def __init__(self):
+		HTMLParser.__init__(self)
+		self.done = False
+
+	def run(self, html):
+		for start in range(0, len(html), CHUNK_SIZE):
+			self.feed(html[start:start + CHUNK_SIZE])
+			if self.done:
+				break
+		else:
+			self.close()
+			self.flush()
+		return self
+
+	# HTMLParser hands over text as far as the end of each chunk it's fed, so a value can arrive in several pieces. The extractors add them up in text and store the value once the next tag shows up
+	def flush(self):
+		pass
+
+# pulls the first online and paper price out of an MTG Goldfish price page, the same values as the first div.price-box-price in div.price-box.online and div.price-box.paper
+class PriceExtractor(Extractor):
+
+	def __init__(self):
+		Extractor.__init__(self)
+		self.prices = {'online': None, 'paper': None}
+		self.box = None     # which price box we are inside, if any
+		self.capture = None # which box the text we're collecting belongs to
+		self.text = ''
+
+	def handle_starttag(self, tag, attrs):
+		self.flush()
+		if tag != 'div':
+			return
+		classes = (dict(attrs).get('class') or '').split()
+		if 'price-box' in classes:
+			for box in ('online', 'paper'):
+				if box in classes and self.prices[box] is None:
+					self.box = box
+		elif 'price-box-price' in classes and self.box is not None:
+			self.capture = self.box
+			self.text = ''
+
+	def handle_endtag(self, tag):
+		self.flush()
+
+	def handle_data(self, data):
+		if self.capture is not None:
+			self.text = self.text + data
+
+	def flush(self):
+		if self.capture is None:
+			return
+		self.prices[self.capture] = self.text or None
+		self.capture = None
+		self.box = None
+		if self.prices['online'] is not None and self.prices['paper'] is not None:
+			self.done = True
+
+# collects card names from a Gatherer search page (the link inside each span.cardTitle) and how many cards the whole search found, or the card name if Gatherer sent us straight to a card page
+class SearchExtractor(Extractor):
+
+	def __init__(self):
+		Extractor.__init__(self)
+		self.titles = []
+		self.single = None
+		self.total = None
+		self.heading = None   # text of the search heading while we're inside it
+		self.inTitle = False  # inside a span.cardTitle
+		self.capture = None   # 'title' or 'single' while the text we're collecting is a card name
+		self.text = ''
+
+	def handle_starttag(self, tag, attrs):
+		self.flush()
+		if tag == 'span':
+			attrs = dict(attrs)
+			if 'cardTitle' in (attrs.get('class') or '').split():
+				self.inTitle = True
+			elif attrs.get('id') == SINGLE_CARD_ID and self.single is None:
+				self.capture = 'single'
+				self.text = ''
+			elif attrs.get('id') == SEARCH_TERM_ID and self.total is None:
+				self.heading = ''
+		elif tag == 'a' and self.inTitle:
+			self.capture = 'title'
+			self.text = ''
+			self.inTitle = False
+
+	def handle_endtag(self, tag):
+		self.flush()
+		if tag == 'span':
+			self.inTitle = False
+			if self.heading is not None:
+				match = TOTAL_PATTERN.search(self.heading)
+				self.total = int(match.group(1)) if match else None
+				self.heading = None
+
+	def handle_data(self, data):
+		if self.heading is not None:
+			self.heading = self.heading + data
+		if self.capture is not None:
+			self.text = self.text + data
+
+	def flush(self):
+		if self.capture == 'title' and self.text:
+			self.titles.append(self.text)
+		elif self.capture == 'single':
+			self.single = self.text or None
+		self.capture = None
+
+# (MTGO price, paper price) from an MTG Goldfish page. A price the page doesn't have comes back as 'None', same as the bot has always shown it
+def extractPrices(html):
+	prices = PriceExtractor().run(html).prices
+	return (prices['online'] or 'None', prices['paper'] or 'None')
+
+# (list of card names, single card name or None, number of cards the search found or None) from a Gatherer search page. The names are only the ones on this page
+def extractSearch(html):
+	extractor = SearchExtractor().run(html)
+	return (extractor.titles, extractor.single, extractor.total)
@@ -0,0 +1,89 @@
+import asyncio                            # pages load on the bot's loop
+import logging                            # a failed prefetch is only worth a log line
+import sys                                # rough memory accounting
+from scheduler import INTERACTIVE, BULK   # someone paging waits on a page, a prefetch doesn't
+
+# a list of card names that may only be partly here. Results from the card store or a booster arrive whole, a remote search brings in one upstream page at a time as people !cont through it or jump ahead with !N
+class Results:
+	__slots__ = ('pages', 'pageSize', 'total', 'loader', 'bytes')
+
+	# firstPage is page 0. loader(page, priority) is a coroutine giving (names, total or None) for any later page, and total is None if the site didn't say how many there are
+	def __init__(self, firstPage, total=None, pageSize=None, loader=None):
+		self.pages = {0: firstPage}
+		self.pageSize = pageSize or max(1, len(firstPage))
+		self.total = total
+		self.loader = loader
+		self.bytes = sys.getsizeof(self.pages) + pageBytes(firstPage) # counted as pages come in, so size() doesn't walk every name
+		if loader is None or len(firstPage) < self.pageSize:
+			self.total = len(firstPage)
+
+	# how many names there are, or at least how many we know of when the site didn't give a total
+	def __len__(self):
+		if self.total is not None:
+			return self.total
+		last = max(self.pages)
+		return last * self.pageSize + len(self.pages[last])
+
+	def complete(self):
+		return self.total is not None
+
+	@asyncio.coroutine
+	def page(self, number, priority=INTERACTIVE):
+		if number not in self.pages:
+			names, total = yield from self.loader(number, priority) # the loader goes through single flight, so two people paging to the same page share one request. A prefetch has a flight of its own, a !cont that catches it up doesn't wait behind it
+			if number in self.pages: # the prefetch and a !cont both loaded it, the first one in keeps it
+				return self.pages[number]
+			self.pages[number] = names
+			self.bytes = self.bytes + pageBytes(names)
+			if total is not None:
+				self.total = total
+			elif len(names) < self.pageSize: # a short page is the last one
+				self.total = number * self.pageSize + len(names)
+		return self.pages[number]
+
+	# names from start up to stop, loading the pages they're on if we don't have them yet. Shorter than asked for at the end of the list
+	@asyncio.coroutine
+	def names(self, start, stop, priority=INTERACTIVE):
+		if self.total is not None:
+			stop = min(stop, self.total)
+		found = []
+		if stop <= start:
+			return found
+		for number in range(start // self.pageSize, (stop - 1) // self.pageSize + 1):
+			page = yield from self.page(number, priority)
+			found.extend(page[max(0, start - number * self.pageSize):stop - number * self.pageSize])
+			if len(page) < self.pageSize:
+				break
+		return found
+
+	# the name at index, or None if the list isn't that long
+	@asyncio.coroutine
+	def get(self, index, priority=INTERACTIVE):
+		names = yield from self.names(index, index + 1, priority)
+		return names[0] if names else None
+
+	# every name we have without going back to the site, from the start of the list up to the first page we haven't loaded
+	def loaded(self):
+		found = []
+		number = 0
+		while number in self.pages:
+			found.extend(self.pages[number])
+			number = number + 1
+		return found
+
+	# start loading the page with index on it in the background, so it's already here when someone asks
+	def prefetch(self, index):
+		if self.loader is None or (self.total is not None and index >= self.total) or index // self.pageSize in self.pages:
+			return
+		asyncio.ensure_future(self.page(index // self.pageSize, BULK)).add_done_callback(prefetched)
+
+	def size(self):
+		return self.bytes
+
+# rough bytes held by a page of names
+def pageBytes(names):
+	return sys.getsizeof(names) + sum(sys.getsizeof(name) for name in names)
+
+def prefetched(future):
+	if not future.cancelled() and future.exception() is not None:
+		logging.info('Prefetching a page of results failed: %r', future.exception())
@@ -0,0 +1,51 @@
+import re                                 # regex, compiled once here instead of on every message
+
+COMMAND_PREFIX = '!'
+MAX_CARDS = 30 # most [[...]] lookups we'll do for one message, enough for a decklist
+
+CARD_PATTERN = re.compile(r'\[\[([^\[\]]+)\]\]([A-Za-z0-9]+)?') # [[Doom Blade]]M10 -> ('Doom Blade', 'M10'), the set code is optional and has to follow the brackets straight away
+NUMBER_PATTERN = re.compile(r'!([0-9]{1,3})(?![0-9])')          # !12 anywhere in a message picks a card from the last list
+
+# works out which handler a message is for. Commands are a dictionary lookup on the first word, and a message with no command character and no [[ is turned away before anything else is looked at
+class Router:
+
+	def __init__(self):
+		self.commands = {}       # command word (without the !) -> handler
+		self.cardHandler = None  # gets every (name, set code) pair in a message
+		self.numberHandler = None
+
+	# decorator for a !command handler. The handler gets the message and the text after the command word
+	def command(self, *names):
+		def register(handler):
+			for name in names:
+				self.commands[name] = handler
+			return handler
+		return register
+
+	def cards(self, handler):
+		self.cardHandler = handler
+		return handler
+
+	def number(self, handler):
+		self.numberHandler = handler
+		return handler
+
+	# (handler, argument) for a message, or None if it isn't for us
+	def route(self, content):
+		hasCommand = COMMAND_PREFIX in content
+		if not hasCommand and '[[' not in content: # the vast majority of chat
+			return None
+		if content.startswith(COMMAND_PREFIX):
+			word, space, rest = content[1:].partition(' ')
+			handler = self.commands.get(word)
+			if handler is not None:
+				return (handler, rest.strip())
+		if '[[' in content and self.cardHandler is not None:
+			pairs = [(match.group(1).strip(), match.group(2) or '') for match in CARD_PATTERN.finditer(content)][:MAX_CARDS]
+			if pairs:
+				return (self.cardHandler, pairs)
+		if hasCommand and self.numberHandler is not None:
+			match = NUMBER_PATTERN.search(content)
+			if match:
+				return (self.numberHandler, int(match.group(1)))
+		return None
@@ -0,0 +1,144 @@
+import asyncio                            # waiting requests are futures on the bot's loop
+import heapq                              # waiting requests, lowest priority number first
+import itertools                          # tie breaker so equal priorities go first come first served
+import random                             # jitter on backoff
+import time                               # token refills and backoff deadlines
+
+# priorities, lower goes first
+INTERACTIVE = 0 # someone is waiting on the answer in Discord
+BULK = 1        # search paging, cache warming and anything else nobody is staring at
+
+# defaults, overridable in the [Scheduler] section of config.ini
+RATE = 5.0          # requests per second to any one host, on average
+BURST = 10          # requests a host can take at once after being quiet
+CONCURRENCY = 4     # requests in flight to any one host
+MAX_QUEUE = 50      # requests waiting for a host before new ones are turned away, or an interactive one pushes out a background one
+MAX_BULK_QUEUE = 20 # background requests waiting for a host before more are turned away, so they can't fill the queue on their own
+MAX_WAIT = 5.0      # seconds an interactive request waits for its turn before we give up and tell the user to try again
+BACKOFF_BASE = 0.5  # seconds to back off after the first 429/5xx, doubled for each one after
+BACKOFF_MAX = 30.0  # longest we'll back off for
+
+# raised instead of making someone wait when a host is swamped or throttling us. The bot answers it with a quick "try again shortly"
+class Overloaded(Exception):
+	pass
+
+# state for one upstream host: its token bucket, what's in flight and who is waiting
+class HostQueue:
+
+	def __init__(self, name, burst):
+		self.name = name
+		self.tokens = float(burst)
+		self.updated = time.monotonic()
+		self.active = 0
+		self.waiting = []       # heap of (priority, sequence, future)
+		self.failures = 0       # 429/5xx in a row, for the backoff
+		self.pausedUntil = 0.0  # no new requests to this host before this time
+		self.timer = None       # pending wake up for a token refill or the end of a backoff
+		self.shed = 0
+		self.backoffs = 0
+
+# every outbound request asks this for a turn first. Each host gets a token bucket rate limit and a cap on requests in flight, waiting requests are served interactive first, and 429/5xx answers pause the host with exponential backoff and jitter
+class Scheduler:
+
+	def __init__(self, rate=RATE, burst=BURST, concurrency=CONCURRENCY, maxQueue=MAX_QUEUE, maxWait=MAX_WAIT, maxBulkQueue=MAX_BULK_QUEUE):
+		self.rate = rate
+		self.burst = burst
+		self.concurrency = concurrency
+		self.maxQueue = maxQueue
+		self.maxBulkQueue = maxBulkQueue
+		self.maxWait = maxWait
+		self.hosts = {}
+		self.sequence = itertools.count()
+
+	def configure(self, config):
+		if not config.has_section('Scheduler'):
+			return
+		self.rate = config.getfloat('Scheduler', 'Rate', fallback=self.rate)
+		self.burst = config.getint('Scheduler', 'Burst', fallback=self.burst)
+		self.maxQueue = config.getint('Scheduler', 'MaxQueue', fallback=self.maxQueue)
+		self.maxBulkQueue = config.getint('Scheduler', 'MaxBulkQueue', fallback=self.maxBulkQueue)
+		self.maxWait = config.getfloat('Scheduler', 'MaxWait', fallback=self.maxWait)
+
+	def host(self, name):
+		if name not in self.hosts:
+			self.hosts[name] = HostQueue(name, self.burst)
+		return self.hosts[name]
+
+	# wait for a turn to send a request to host. Raises Overloaded if the queue is full, or if an interactive request would wait longer than maxWait. Background requests are the ones shed first: they have a cap of their own, and an interactive request that finds the queue full pushes out the newest background one
+	@asyncio.coroutine
+	def acquire(self, host, priority=INTERACTIVE):
+		queue = self.host(host)
+		waiting = [entry for entry in queue.waiting if not entry[2].done()]
+		if priority != INTERACTIVE and sum(1 for entry in waiting if entry[0] != INTERACTIVE) >= self.maxBulkQueue:
+			queue.shed = queue.shed + 1
+			raise Overloaded('%s has too many background requests waiting' % host)
+		if len(waiting) >= self.maxQueue:
+			worst = max(waiting, key=lambda entry: entry[:2]) # lowest priority, and the newest of those
+			if worst[0] <= priority:
+				queue.shed = queue.shed + 1
+				raise Overloaded('%s has too many requests waiting' % host)
+			worst[2].set_exception(Overloaded('%s is too busy for background requests right now' % host))
+			queue.shed = queue.shed + 1
+		future = asyncio.Future()
+		heapq.heappush(queue.waiting, (priority, next(self.sequence), future))
+		self.dispatch(queue)
+		try:
+			yield from asyncio.wait([future], timeout=self.maxWait if priority == INTERACTIVE else None)
+		except asyncio.CancelledError: # whoever wanted this went away, don't leave a turn handed out to nobody
+			if future.done() and not future.cancelled() and future.exception() is None:
+				self.release(host)
+			future.cancel()
+			raise
+		if not future.done():
+			future.cancel() # dispatch skips cancelled requests
+			queue.shed = queue.shed + 1
+			raise Overloaded('%s is too busy right now' % host)
+		future.result() # raises Overloaded if an interactive request pushed this one out of the queue
+
+	# hand a turn back. status is the HTTP status we got (None if the request failed or it wasn't HTTP), retryAfter the Retry-After header if there was one
+	def release(self, host, status=None, retryAfter=None):
+		queue = self.host(host)
+		queue.active = queue.active - 1
+		if status is not None and (status == 429 or status >= 500):
+			queue.failures = queue.failures + 1
+			queue.backoffs = queue.backoffs + 1
+			delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (queue.failures - 1)) * random.uniform(0.5, 1.5)
+			try:
+				delay = max(delay, min(BACKOFF_MAX, float(retryAfter)))
+			except (TypeError, ValueError):
+				pass
+			queue.pausedUntil = max(queue.pausedUntil, time.monotonic() + delay)
+		elif status is not None:
+			queue.failures = 0
+		self.dispatch(queue)
+
+	# give turns to waiting requests, best priority first, while the host has tokens, free slots and isn't backing off
+	def dispatch(self, queue):
+		now = time.monotonic()
+		queue.tokens = min(float(self.burst), queue.tokens + (now - queue.updated) * self.rate)
+		queue.updated = now
+		while queue.waiting and queue.active < self.concurrency:
+			if queue.waiting[0][2].done(): # gave up waiting
+				heapq.heappop(queue.waiting)
+				continue
+			if now < queue.pausedUntil:
+				self.wakeUp(queue, queue.pausedUntil - now)
+				break
+			if queue.tokens < 1:
+				self.wakeUp(queue, (1 - queue.tokens) / self.rate)
+				break
+			priority, sequence, future = heapq.heappop(queue.waiting)
+			queue.tokens = queue.tokens - 1
+			queue.active = queue.active + 1
+			future.set_result(None)
+
+	def wakeUp(self, queue, delay):
+		if queue.timer is None:
+			queue.timer = asyncio.get_event_loop().call_later(delay, self.wake, queue)
+
+	def wake(self, queue):
+		queue.timer = None
+		self.dispatch(queue)
+
+	def stats(self):
+		return {queue.name: {'active': queue.active, 'waiting': sum(1 for entry in queue.waiting if not entry[2].done()), 'shed': queue.shed, 'backoffs': queue.backoffs} for queue in self.hosts.values()}
@@ -0,0 +1,119 @@
+import collections                        # OrderedDict doubles as our LRU list
+import time                               # expiry
+from results import Results               # the card list a session pages through, possibly only partly loaded
+
+# defaults, overridable in the [Sessions] section of config.ini
+MAX_ENTRIES = 1000   # sessions kept before the least recently used one is dropped
+MAX_MEMORY = 64      # megabytes of result lists kept across every session
+TTL = 3600           # seconds a session lives after it was last used
+PER_USER = False     # True gives every user their own results in a channel instead of sharing them
+
+# what a channel (or a user in a channel) is working with: the last list of cards, how far through it we've paged and the other side of the last flip card
+class Session:
+	__slots__ = ('key', 'cards', 'shown', 'flip', 'size', 'expires')
+
+	def __init__(self, key):
+		self.key = key
+		self.cards = Results([]) # card names from the last search, booster or partial name lookup
+		self.shown = 0    # how many cards of the list have been shown, !cont carries on from here
+		self.flip = ''    # name of the reverse side of the last flip or meld card
+		self.size = 0     # rough bytes held by cards, used for the memory cap
+		self.expires = 0
+
+# keeps the sessions for every channel, bounded by count, memory and age. Lookups are a dictionary hit, and result lists are stored as they are rather than copied
+class SessionStore:
+
+	def __init__(self, maxEntries=MAX_ENTRIES, maxMemory=MAX_MEMORY, ttl=TTL, perUser=PER_USER):
+		self.maxEntries = maxEntries
+		self.maxBytes = maxMemory * 1024 * 1024
+		self.ttl = ttl
+		self.perUser = perUser
+		self.sessions = collections.OrderedDict() # key -> Session, most recently used last
+		self.bytes = 0
+		self.evictions = 0
+
+	def configure(self, config):
+		if not config.has_section('Sessions'):
+			return
+		self.maxEntries = config.getint('Sessions', 'MaxEntries', fallback=self.maxEntries)
+		self.maxBytes = config.getint('Sessions', 'MaxMemoryMB', fallback=self.maxBytes // (1024 * 1024)) * 1024 * 1024
+		self.ttl = config.getfloat('Sessions', 'TTL', fallback=self.ttl)
+		self.perUser = config.getboolean('Sessions', 'PerUser', fallback=self.perUser)
+
+	def __len__(self):
+		return len(self.sessions)
+
+	# (server, channel) or (server, channel, user). Direct messages have no server
+	def keyFor(self, message):
+		server = message.server.id if message.server else None
+		if self.perUser:
+			return (server, message.channel.id, message.author.id)
+		return (server, message.channel.id)
+
+	# the session for this message's channel, or None if there isn't a live one
+	def find(self, message):
+		key = self.keyFor(message)
+		session = self.sessions.get(key)
+		if session is None:
+			return None
+		if session.expires < time.monotonic():
+			self.drop(key)
+			return None
+		session.expires = time.monotonic() + self.ttl
+		self.sessions.move_to_end(key)
+		return session
+
+	# the session for this message's channel, starting a new one if needed
+	def open(self, message):
+		session = self.find(message)
+		if session is None:
+			session = Session(self.keyFor(message))
+			session.expires = time.monotonic() + self.ttl
+			self.sessions[session.key] = session
+			self.evict()
+		return session
+
+	# give a session a new Results to page through. The names are kept as they are, not copied
+	def setCards(self, session, cards):
+		session.cards = cards
+		session.shown = 0
+		self.resize(session)
+
+	# count a session's memory again, after more pages of its results came in. Nothing to do if no page came in
+	def resize(self, session):
+		if session.cards.size() == session.size:
+			return
+		if self.sessions.get(session.key) is not session: # dropped while its page was loading
+			session.size = session.cards.size()
+			return
+		self.bytes = self.bytes - session.size
+		session.size = session.cards.size()
+		self.bytes = self.bytes + session.size
+		self.evict(session.key)
+
+	def drop(self, key):
+		session = self.sessions.pop(key, None)
+		if session is not None:
+			self.bytes = self.bytes - session.size
+
+	# throw out expired sessions and then the least recently used until we're under both caps. The session that was just written is kept even if it alone is over the memory cap
+	def evict(self, keep=None):
+		now = time.monotonic()
+		while self.sessions: # every use pushes a session's expiry back by the same ttl and moves it to the end, so the expired ones are all at the front
+			key, session = next(iter(self.sessions.items()))
+			if session.expires >= now or key == keep:
+				break
+			self.drop(key)
+			self.evictions = self.evictions + 1
+		while self.sessions and (len(self.sessions) > self.maxEntries or self.bytes > self.maxBytes):
+			key = next(iter(self.sessions))
+			if key == keep:
+				if len(self.sessions) == 1:
+					break
+				self.sessions.move_to_end(key)
+				continue
+			self.drop(key)
+			self.evictions = self.evictions + 1
+
+	def stats(self):
+		return {'size': len(self.sessions), 'bytes': self.bytes, 'evictions': self.evictions}
@@ -0,0 +1,205 @@
+import asyncio                            # the worker side of everything here runs on the bot's loop
+import collections                        # OrderedDict doubles as our LRU list
+import concurrent.futures                 # threads to wait on other workers' lookups with
+import logging                            # losing the supervisor is logged, the worker carries on alone
+import threading                          # the store is served to every worker at once, one thread per connection
+import time                               # wall clock expiry, the same in every process
+from multiprocessing.managers import BaseManager # serves the store to the worker processes over a local socket
+from singleflight import SingleFlight     # lookups are still coalesced inside a worker before they're coalesced across workers
+
+# defaults, the store's size is overridable in the [Shards] section of config.ini
+MAX_ENTRIES = 100000  # cache entries the store holds before the least recently used is dropped
+LINGER = 5.0          # seconds a finished lookup's result is kept for workers that joined it just as it finished
+WAIT = 15.0           # seconds a worker waits on another worker's lookup before doing it itself
+WAITERS = 32          # threads a worker has for waiting on other workers' lookups
+
+# which shard Discord sends a server's events to
+def shardFor(serverId, shardCount):
+	return (int(serverId) >> 22) % shardCount
+
+# lives in the supervisor's manager process and is shared by every worker: a cache of prices, card printings and searches, and the lookups one of the workers is making right now. Each worker connection gets its own thread in the manager, so a worker waiting on a lookup only blocks itself
+class SharedStore:
+
+	def __init__(self, maxEntries=MAX_ENTRIES):
+		self.maxEntries = maxEntries
+		self.lock = threading.Lock()
+		self.entries = collections.OrderedDict() # (kind, key) -> (value, expires), most recently used last
+		self.flights = {}                        # key -> Flight
+		self.hits = 0
+		self.misses = 0
+
+	# (value, seconds left) or None
+	def get(self, kind, key):
+		with self.lock:
+			entry = self.entries.get((kind, key))
+			if entry is None or entry[1] <= time.time():
+				self.misses = self.misses + 1
+				return None
+			self.hits = self.hits + 1
+			self.entries.move_to_end((kind, key))
+			return (entry[0], entry[1] - time.time())
+
+	def put(self, kind, key, value, ttl):
+		with self.lock:
+			self.entries[(kind, key)] = (value, time.time() + ttl)
+			self.entries.move_to_end((kind, key))
+			while len(self.entries) > self.maxEntries:
+				self.entries.popitem(last=False)
+
+	# True if the caller should make the lookup for key, False if another worker already is (or just did)
+	def claim(self, key):
+		with self.lock:
+			now = time.monotonic()
+			for stale in [flightKey for flightKey, flight in self.flights.items() if (flight.finished or flight.started + WAIT) + LINGER < now]: # finished a while ago, or its worker died mid lookup
+				del self.flights[stale]
+			if key in self.flights:
+				return False
+			self.flights[key] = Flight()
+			return True
+
+	def finish(self, key, value, ok=True):
+		with self.lock:
+			flight = self.flights.get(key)
+			if flight is None:
+				return
+			flight.value = value
+			flight.ok = ok
+			flight.finished = time.monotonic()
+			flight.event.set()
+
+	# (ok, value) once the worker making the lookup for key is done, None if it took longer than timeout or there's no such lookup
+	def wait(self, key, timeout):
+		with self.lock:
+			flight = self.flights.get(key)
+		if flight is None or not flight.event.wait(timeout):
+			return None
+		return (flight.ok, flight.value)
+
+	def stats(self):
+		with self.lock:
+			return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'inflight': sum(1 for flight in self.flights.values() if not flight.finished)}
+
+class Flight:
+	__slots__ = ('event', 'value', 'ok', 'started', 'finished')
+
+	def __init__(self):
+		self.event = threading.Event()
+		self.started = time.monotonic()
+		self.value = None
+		self.ok = False
+		self.finished = 0.0
+
+store = None # the one SharedStore in the manager process
+
+def sharedStore(maxEntries=MAX_ENTRIES):
+	global store
+	if store is None:
+		store = SharedStore(maxEntries)
+	return store
+
+class SharedManager(BaseManager):
+	pass
+
+SharedManager.register('store', callable=sharedStore)
+
+# proxy calls block on a socket, so the worker makes them from its own threads. Returns None if the supervisor has gone away, and everything here treats that as a miss
+@asyncio.coroutine
+def call(executor, method, *args):
+	try:
+		return (yield from asyncio.get_event_loop().run_in_executor(executor, method, *args))
+	except (OSError, EOFError) as error:
+		logging.warning('Shared store unavailable: %r', error)
+		return None
+
+# the worker's view of the shared cache. It has the same interface as DiskCache and sits in front of the worker's own one, so a price one worker fetched is a hit in every other worker
+class SharedCache:
+
+	def __init__(self, store, behind, executor):
+		self.store = store
+		self.behind = behind   # this worker's DiskCache
+		self.executor = executor
+		self.hits = 0
+
+	@property
+	def ttls(self):
+		return self.behind.ttls
+
+	def configure(self, config):
+		self.behind.configure(config)
+
+	@asyncio.coroutine
+	def lookup(self, kind, key):
+		entry = yield from call(self.executor, self.store.get, kind, key)
+		if entry is not None:
+			self.hits = self.hits + 1
+			return entry
+		entry = yield from self.behind.lookup(kind, key)
+		if entry is not None: # on disk from before a restart, share it
+			self.executor.submit(self.store.put, kind, key, entry[0], entry[1])
+		return entry
+
+	@asyncio.coroutine
+	def get(self, kind, key, loader, ttl=None):
+		entry = yield from self.lookup(kind, key)
+		if entry is not None:
+			return entry[0]
+		value = yield from loader()
+		self.put(kind, key, value, ttl)
+		return value
+
+	def put(self, kind, key, value, ttl=None):
+		self.executor.submit(self.store.put, kind, key, value, ttl if ttl is not None else self.behind.ttls.get(kind, self.behind.ttls['search']))
+		self.behind.put(kind, key, value, ttl)
+
+	def close(self):
+		self.behind.close()
+
+	def stats(self):
+		stats = self.behind.stats()
+		stats['shared_hits'] = self.hits
+		return stats
+
+# single flight across every worker. Identical lookups inside this worker are coalesced first, then one worker makes the upstream call and the others wait for its answer. If that worker fails or is too slow, the others make the call themselves
+class SharedFlights:
+
+	def __init__(self, store, executor, wait=WAIT):
+		self.store = store
+		self.executor = executor
+		self.waiters = concurrent.futures.ThreadPoolExecutor(max_workers=WAITERS) # waits block a thread for a while, they get their own so they can't hold up a finish another worker is waiting on
+		self.wait = wait
+		self.local = SingleFlight()
+		self.led = collections.Counter()    # kind -> lookups this worker made for everyone
+		self.joined = collections.Counter() # kind -> lookups answered by another worker
+
+	@asyncio.coroutine
+	def do(self, key, loader):
+		return (yield from self.local.do(key, lambda: self.remote(key, loader)))
+
+	@asyncio.coroutine
+	def remote(self, key, loader):
+		leader = yield from call(self.executor, self.store.claim, key)
+		if leader is False:
+			result = yield from call(self.waiters, self.store.wait, key, self.wait)
+			if result is not None and result[0]:
+				self.joined[key[0]] += 1
+				return result[1]
+			return (yield from loader()) # it failed over there, try ourselves
+		if leader is None: # no supervisor, just do it
+			return (yield from loader())
+		self.led[key[0]] += 1
+		try:
+			value = yield from loader()
+		except Exception:
+			self.executor.submit(self.store.finish, key, None, False)
+			raise
+		self.executor.submit(self.store.finish, key, value)
+		return value
+
+	def __len__(self):
+		return len(self.local)
+
+	def stats(self):
+		stats = self.local.stats()
+		stats['led'] = dict(self.led)
+		stats['joined'] = dict(self.joined)
+		return stats
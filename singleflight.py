@@ -0,0 +1,33 @@
+import asyncio                            # in flight lookups are futures on the bot's loop
+import collections                        # counters per kind of lookup
+
+# makes identical lookups that happen at the same time share one upstream call. The first caller starts it, everyone asking for the same key while it runs waits on the same result (or the same error)
+class SingleFlight:
+
+	def __init__(self):
+		self.calls = {}                           # key -> future of the lookup in flight
+		self.started = collections.Counter()      # kind -> upstream calls actually made
+		self.coalesced = collections.Counter()    # kind -> callers that piggybacked on someone else's call
+
+	# keys are tuples whose first item is the kind of lookup ('card', 'price', 'gatherer', 'search', ...), used for the counters
+	@asyncio.coroutine
+	def do(self, key, loader):
+		future = self.calls.get(key)
+		if future is None:
+			self.started[key[0]] += 1
+			future = asyncio.ensure_future(loader())
+			self.calls[key] = future
+			future.add_done_callback(lambda done: self.forget(key, done))
+		else:
+			self.coalesced[key[0]] += 1
+		return (yield from asyncio.shield(future)) # shielded so one impatient caller being cancelled doesn't cancel the lookup for everyone else
+
+	def forget(self, key, future):
+		if self.calls.get(key) is future:
+			del self.calls[key]
+
+	def __len__(self):
+		return len(self.calls)
+
+	def stats(self):
+		return {'inflight': len(self.calls), 'started': dict(self.started), 'coalesced': dict(self.coalesced)}
@@ -0,0 +1,145 @@
+import asyncio                            # the warmer is a background task on the bot's loop
+import collections                        # recently asked for cards, and the queue of new set cards
+import heapq                              # the most popular cards out of everything we track
+import logging                            # a failed refresh is logged, nobody is waiting on it
+import time                               # when the new sets are due for warming again
+
+# defaults, overridable in the [Warmer] section of config.ini
+ENABLED = True
+TOP = 100             # most popular cards whose prices are kept warm
+BUDGET = 40           # most price pages fetched per round, regular and foil count separately
+CONCURRENCY = 4       # price pages fetched at the same time, so a round never fills the site's queue
+INTERVAL = 60.0       # seconds between rounds. A price is refreshed if it would expire before the round after next
+NEW_SET_DAYS = 30     # sets released this many days ago or less count as new, 0 turns new set warming off
+SET_INTERVAL = 21600  # seconds between warming the new sets' prices, every 6 hours
+TRACKED = 5000        # cards remembered as candidates for the top list, most recently asked for
+WIDTH = 4096          # counters per row of the sketch
+DEPTH = 4             # rows of the sketch, each with its own hash
+
+# count-min sketch of how often each card is asked for, in a fixed amount of memory. Every so often all the counts are halved so that what was popular last month fades out and a card everyone is asking about today can overtake it
+class FrequencySketch:
+
+	def __init__(self, width=WIDTH, depth=DEPTH):
+		self.width = width
+		self.rows = [[0] * width for row in range(depth)]
+		self.additions = 0
+		self.sampleSize = width * 10 # additions between halvings
+
+	def indexes(self, key):
+		return [hash((row, key)) % self.width for row in range(len(self.rows))]
+
+	# count one more request for key. Only the smallest counters go up (conservative update), which keeps collisions from inflating everything
+	def add(self, key):
+		indexes = self.indexes(key)
+		smallest = min(row[index] for row, index in zip(self.rows, indexes))
+		for row, index in zip(self.rows, indexes):
+			if row[index] == smallest:
+				row[index] = smallest + 1
+		self.additions = self.additions + 1
+		if self.additions >= self.sampleSize:
+			self.halve()
+
+	def estimate(self, key):
+		return min(row[index] for row, index in zip(self.rows, self.indexes(key)))
+
+	def halve(self):
+		self.rows = [[count >> 1 for count in row] for row in self.rows]
+		self.additions = self.additions // 2
+
+# keeps the prices of the cards people actually ask for fresh, so the first lookup after a price expires is still a cache hit. Every round it refreshes the popular cards' regular and foil prices that are about to expire, then spends what's left of its budget on cards from newly released sets
+class Warmer:
+
+	# refresh(key) is a coroutine that fetches and caches the price for (set, name, foil). newCards(days) gives the (set, name) of every card in sets released in the last days days. busy() is True while the price site has requests waiting for a turn
+	def __init__(self, priceCache, refresh, newCards=None, busy=None):
+		self.priceCache = priceCache
+		self.refresh = refresh
+		self.newCards = newCards
+		self.busy = busy
+		self.enabled = ENABLED
+		self.top = TOP
+		self.budget = BUDGET
+		self.concurrency = CONCURRENCY
+		self.interval = INTERVAL
+		self.newSetDays = NEW_SET_DAYS
+		self.setInterval = SET_INTERVAL
+		self.sketch = FrequencySketch()
+		self.candidates = collections.OrderedDict() # (set, name) -> None, most recently asked for last
+		self.newQueue = collections.deque()         # (set, name) from new sets still to warm
+		self.nextSetWarm = 0.0
+		self.task = None
+		self.refreshed = 0
+		self.failed = 0
+		self.skipped = 0 # rounds cut short because people were waiting on the price site
+
+	def configure(self, config):
+		if not config.has_section('Warmer'):
+			return
+		self.enabled = config.getboolean('Warmer', 'Enabled', fallback=self.enabled)
+		self.top = config.getint('Warmer', 'Top', fallback=self.top)
+		self.budget = config.getint('Warmer', 'Budget', fallback=self.budget)
+		self.concurrency = max(1, config.getint('Warmer', 'Concurrency', fallback=self.concurrency))
+		self.interval = config.getfloat('Warmer', 'Interval', fallback=self.interval)
+		self.newSetDays = config.getint('Warmer', 'NewSetDays', fallback=self.newSetDays)
+		self.setInterval = config.getfloat('Warmer', 'SetInterval', fallback=self.setInterval)
+
+	# someone looked up the card with this (set, name) price key
+	def record(self, key):
+		self.sketch.add(key)
+		self.candidates[key] = None
+		self.candidates.move_to_end(key)
+		if len(self.candidates) > TRACKED:
+			self.candidates.popitem(last=False)
+
+	# start the background task. Safe to call more than once
+	def start(self):
+		if self.enabled and self.task is None:
+			self.task = asyncio.ensure_future(self.run())
+
+	@asyncio.coroutine
+	def run(self):
+		while True:
+			yield from asyncio.sleep(self.interval)
+			try:
+				yield from self.warm()
+			except Exception:
+				logging.exception('Price warming round failed')
+
+	# one round: the popular cards first, then new set cards, at most budget price pages in all and concurrency at a time. The round stops as soon as the price site has a queue, people's lookups come first
+	@asyncio.coroutine
+	def warm(self):
+		if self.newCards is not None and self.newSetDays > 0 and time.monotonic() >= self.nextSetWarm:
+			self.newQueue = collections.deque(self.newCards(self.newSetDays))
+			self.nextSetWarm = time.monotonic() + self.setInterval
+		due = []
+		for key in heapq.nlargest(self.top, self.candidates, key=self.sketch.estimate):
+			due.extend((yield from self.expiring(key)))
+		while self.newQueue and len(due) < self.budget:
+			due.extend((yield from self.expiring(self.newQueue.popleft())))
+		due = due[:self.budget]
+		for start in range(0, len(due), self.concurrency):
+			if self.busy is not None and self.busy():
+				self.skipped = self.skipped + 1
+				return
+			batch = due[start:start + self.concurrency]
+			results = yield from asyncio.gather(*[self.refresh(key) for key in batch], return_exceptions=True)
+			for key, result in zip(batch, results):
+				if isinstance(result, Exception):
+					self.failed = self.failed + 1
+					logging.info('Warming the price of %s failed: %r', key, result)
+				else:
+					self.refreshed = self.refreshed + 1
+
+	# the regular and foil price keys for a card that aren't cached or will expire before the round after next. What we don't have fresh ourselves is checked in the cache behind ours too, another worker may have just warmed it
+	@asyncio.coroutine
+	def expiring(self, key):
+		due = []
+		for foil in (False, True):
+			left = self.priceCache.expiresIn(key + (foil,))
+			if left is None or left < self.interval * 2:
+				left = yield from self.priceCache.expiresBehind(key + (foil,))
+			if left is None or left < self.interval * 2:
+				due.append(key + (foil,))
+		return due
+
+	def stats(self):
+		return {'tracked': len(self.candidates), 'queued': len(self.newQueue), 'refreshed': self.refreshed, 'failed': self.failed, 'skipped': self.skipped}